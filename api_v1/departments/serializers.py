@@ -17,14 +17,50 @@ class DepartmentTreeSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("level", )
 
-    def get_children(self, obj):
+    def get_children(self, obj) -> list[dict]:
         children = obj.children.all()
         if not children:
             return []
         return DepartmentTreeSerializer(children, many=True).data
+
+
+def build_department_tree(departments) -> list[dict]:
+    """
+    Деревья подразделений в формате DepartmentTreeSerializer за один проход.
+    departments должны быть отсортированы по level, чтобы родитель шёл раньше вложенных.
+    Подразделение, родителя которого нет среди departments, выводится как корневое.
+    """
+    nodes = {}
+    roots = []
+    for department in departments:
+        node = {
+            "id": department.id,
+            "name": department.name,
+            "level": department.level,
+            "children": [],
+        }
+        nodes[department.id] = node
+        parent = nodes.get(department.parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent["children"].append(node)
+    return roots
     
     
 class DepartmentSerializer(VersionedModelSerializer):
+    def validate_parent(self, value):
+        if value is None:
+            return value
+        organization_id = self.context["view"].kwargs["organization_id"]
+        if str(value.organization_id) != str(organization_id):
+            raise serializers.ValidationError("Подразделение должно быть в той же организации")
+        if self.instance is not None and self.instance.is_ancestor_of(value):
+            raise serializers.ValidationError(
+                "Подразделение нельзя подчинить самому себе или вложенному подразделению"
+            )
+        return value
+
     class Meta:
         model = Department
         fields = (
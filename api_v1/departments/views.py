@@ -1,10 +1,14 @@
-from rest_framework import viewsets, mixins
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status, viewsets, mixins
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema
 
-from api_v1.departments.serializers import DepartmentSerializer, DepartmentTreeSerializer
+from api_v1.departments.serializers import DepartmentSerializer, DepartmentTreeSerializer, build_department_tree
 from api_v1.mixins import UpdateModelMixin
 from api_v1.permissions import IsHRPermission
+from departments.cache import get_cached_tree, get_tree_version
 from departments.models import Department
 
 
@@ -26,16 +30,12 @@ class DepartmentViewSet(
     def get_queryset(self):
         organization_id = self.kwargs["organization_id"]
         if self.action == "list":
+            # всё дерево одним запросом, собирается в build_department_tree
             return (
                 Department.objects
-                .filter(
-                    organization_id=organization_id,
-                    parent__isnull=True,
-                )
-                .prefetch_related(
-                    "children__children__children__children__children__children__children"
-                )
-                .order_by("name")
+                .filter(organization_id=organization_id)
+                .only("id", "name", "level", "parent_id")
+                .order_by("level", "name")
             )
         return Department.objects.filter(organization_id=organization_id)
         
@@ -52,11 +52,28 @@ class DepartmentViewSet(
         description=(
             "Получение списка подразделений организации. "
             "Возращает деревья главных подразделений. "
+            "Ответ содержит ETag, при совпадении If-None-Match возвращается 304. "
             "Доступно hr специалистам."
-        )
+        ),
+        responses=DepartmentTreeSerializer(many=True),
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        # дерево кэшируется по версии организации, клиент может прислать If-None-Match
+        organization_id = self.kwargs["organization_id"]
+        version = get_tree_version(organization_id)
+        etag = f'"departments-{organization_id}-{version}"'
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            tree = get_cached_tree(
+                organization_id,
+                version,
+                lambda: build_department_tree(self.filter_queryset(self.get_queryset())),
+            )
+            response = Response(tree)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
     
     @extend_schema(
         description=(
@@ -2,6 +2,8 @@ from django.conf import settings
 from django.db.models.query import prefetch_related_objects
 from rest_framework.response import Response
 
+from core.models import VersionConflict
+
 
 class UpdateModelMixin:
     """
@@ -13,12 +15,18 @@ class UpdateModelMixin:
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        if instance.version != serializer.validated_data.get('version'):
+        version = serializer.validated_data.get('version')
+        if version is None:
             return Response(
                 data={"detail": "Объект был изменён другим пользователем. Обновите страницу."},
                 status=409
             )
-        self.perform_update(serializer)
+        # версия проверяется в том же UPDATE, что и запись изменений
+        instance.expected_version = version
+        try:
+            self.perform_update(serializer)
+        except VersionConflict as e:
+            return Response(data={"detail": str(e)}, status=409)
 
         queryset = self.filter_queryset(self.get_queryset())
         if queryset._prefetch_related_lookups:
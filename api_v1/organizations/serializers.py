@@ -19,6 +19,8 @@ class OrganizationSerializer(VersionedModelSerializer):
             "email_password",
             "email_host",
             "email_port",
+            "email_rate_limit",
+            "email_max_connections",
             "version"
         )
 
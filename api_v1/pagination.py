@@ -0,0 +1,83 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def get_cached_count(queryset) -> int:
+    """
+    Число записей выборки, кэшируется на PAGINATION_COUNT_CACHE_TTL секунд
+    по тексту SQL-запроса, поэтому может немного отставать от таблицы.
+    """
+    queryset = queryset.order_by()
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        # например, .none() - запрос в базу не нужен
+        return 0
+    key = "pagination_count:" + hashlib.md5(
+        f"{queryset.model._meta.label}:{sql}".encode()
+    ).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+    return count
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Постраничный вывод по курсору: сначала новые записи, порядок (created_at, id).
+    Скорость не зависит от номера страницы, для запроса нужен индекс (created_at, id).
+    С параметром count=true в ответ добавляется общее число записей из кэша.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = settings.PAGINATION_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param, "").lower() in ("1", "true"):
+            self.count = get_cached_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema["properties"] = {
+            "count": {
+                "type": "integer",
+                "example": 123,
+                "description": "Только при count=true, значение из кэша",
+            },
+            **schema["properties"],
+        }
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append(
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Добавить в ответ общее число записей",
+                "schema": {"type": "boolean"},
+            }
+        )
+        return parameters
@@ -1,5 +1,88 @@
+from drf_spectacular.utils import OpenApiParameter
 from rest_framework import serializers
 
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        str,
+        required=False,
+        description="Поля ответа через запятую, id выводится всегда",
+    ),
+    OpenApiParameter(
+        "expand",
+        str,
+        required=False,
+        description="Вложенные списки через запятую (например, other_documents)",
+    ),
+]
+
+
+def split_query_list(value: str) -> set[str]:
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Выбор полей ответа параметрами запроса fields и expand.
+    Без параметров выводятся все поля. Если передан хотя бы один из них,
+    выводятся перечисленные в fields поля (или все, если fields не передан),
+    а вложенные списки из Meta.expandable_fields - только перечисленные в expand или fields.
+    optimize_queryset подбирает под выбранные поля only(), select_related и prefetch_related.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.get_selected_fields(self.context.get("request"), self.fields)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_selected_fields(cls, request, names) -> set[str]:
+        names = set(names)
+        if request is None:
+            return names
+        params = request.query_params
+        if "fields" not in params and "expand" not in params:
+            return names
+        expandable = set(getattr(cls.Meta, "expandable_fields", ()))
+        requested = split_query_list(params["fields"]) | {"id"} if "fields" in params else None
+        expand = split_query_list(params.get("expand", ""))
+        return {
+            name
+            for name in names
+            if (name in expand or (requested is not None and name in requested))
+            or (name not in expandable and requested is None)
+        }
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request, required=()):
+        """required - поля модели, нужные помимо сериализатора (например, для сортировки)."""
+        serializer = cls(context={"request": request})
+        only = {"id", *required}
+        select_related = set()
+        prefetch_related = []
+        defer_unknown = True
+        for field in serializer.fields.values():
+            if isinstance(field, serializers.ListSerializer):
+                prefetch_related.append(field.source)
+                continue
+            if field.source == "*":
+                # поле читает объект целиком, ограничивать столбцы нельзя
+                defer_unknown = False
+                continue
+            path = field.source.replace(".", "__")
+            only.add(path)
+            if "__" in path:
+                select_related.add(path.rsplit("__", 1)[0])
+        # select_related() без аргументов подтянул бы все внешние ключи
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        queryset = queryset.prefetch_related(*prefetch_related)
+        if defer_unknown:
+            queryset = queryset.only(*only)
+        return queryset
+
 
 class VersionedModelSerializer(serializers.ModelSerializer):
 
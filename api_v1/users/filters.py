@@ -1,4 +1,5 @@
 import django_filters
+from departments.models import Department
 from users.models import Candidate
 
 class CandidateFilter(django_filters.FilterSet):
@@ -6,7 +7,22 @@ class CandidateFilter(django_filters.FilterSet):
     organization = django_filters.NumberFilter(field_name="vacancy__department__organization")
     department = django_filters.CharFilter(field_name="vacancy__department__name", lookup_expr="icontains")
     vacancy_title = django_filters.CharFilter(field_name="vacancy__title", lookup_expr="icontains")
+    department_tree = django_filters.NumberFilter(
+        method="filter_department_tree",
+        label="Подразделение вместе с вложенными (id)",
+    )
+    search = django_filters.CharFilter(
+        field_name="search_document",
+        lookup_expr="fulltext",
+        label="Поиск по ФИО, email и телефону",
+    )
 
     class Meta:
         model = Candidate
-        fields = ["vacancy", "vacancy_title", "organization", "status", "department"]
+        fields = ["vacancy", "vacancy_title", "organization", "status", "department", "department_tree", "search"]
+
+    def filter_department_tree(self, queryset, name, value):
+        path = Department.objects.filter(pk=value).values_list("path", flat=True).first()
+        if path is None:
+            return queryset.none()
+        return queryset.filter(vacancy__department__path__startswith=path)
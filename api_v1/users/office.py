@@ -0,0 +1,259 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "office_worker.py")
+
+
+class OfficeConversionError(Exception):
+    pass
+
+
+def get_soffice_binary() -> str:
+    if settings.LIBREOFFICE_BINARY:
+        return settings.LIBREOFFICE_BINARY
+    if platform.system().lower() == "windows":
+        return r"C:\Program Files\LibreOffice\program\soffice.exe"
+    return "soffice"
+
+
+def get_office_python() -> str:
+    if settings.LIBREOFFICE_PYTHON:
+        return settings.LIBREOFFICE_PYTHON
+    if platform.system().lower() == "windows":
+        return r"C:\Program Files\LibreOffice\program\python.exe"
+    return "/usr/bin/python3"
+
+
+class OfficeWorker:
+    """
+    Долгоживущий экземпляр LibreOffice, управляемый через office_worker.py.
+    """
+
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.conversions = 0
+        self.last_used = time.monotonic()
+        self.process = None
+        self.profile_dir = None
+        self._responses = queue.Queue()
+
+    def start(self, timeout: int):
+        self.profile_dir = tempfile.mkdtemp(prefix=f"lo_profile_{os.getpid()}_{self.slot}_")
+        pipe_name = f"hr_office_{os.getpid()}_{self.slot}_{uuid.uuid4().hex[:8]}"
+        self.process = subprocess.Popen(
+            [get_office_python(), WORKER_SCRIPT, get_soffice_binary(), self.profile_dir, pipe_name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        threading.Thread(target=self._read_responses, daemon=True).start()
+        response = self._wait_response(timeout)
+        if not response.get("ready"):
+            self.stop()
+            raise OfficeConversionError(response.get("error", "LibreOffice не запустился"))
+        self.last_used = time.monotonic()
+
+    def _read_responses(self):
+        for line in self.process.stdout:
+            try:
+                self._responses.put(json.loads(line))
+            except ValueError:
+                continue
+        self._responses.put({"ok": False, "error": "Процесс LibreOffice завершился"})
+
+    def _wait_response(self, timeout: int) -> dict:
+        try:
+            return self._responses.get(timeout=timeout)
+        except queue.Empty:
+            raise OfficeConversionError("Превышено время ожидания ответа LibreOffice")
+
+    def request(self, timeout: int, **command) -> dict:
+        try:
+            self.process.stdin.write(json.dumps(command) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            raise OfficeConversionError("Процесс LibreOffice недоступен")
+        response = self._wait_response(timeout)
+        self.last_used = time.monotonic()
+        if not response.get("ok"):
+            raise OfficeConversionError(response.get("error", "Ошибка LibreOffice"))
+        return response
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.is_alive():
+            try:
+                self.process.stdin.write(json.dumps({"cmd": "quit"}) + "\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=15)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                self.process.kill()
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+
+class LibreOfficePool:
+    """
+    Пул прогретых экземпляров LibreOffice для конвертации DOCX в PDF.
+
+    Экземпляры создаются лениво (не больше size), проверяются ping'ом после
+    простоя и перезапускаются после max_conversions конвертаций или ошибки.
+    """
+
+    def __init__(self, size: int, max_conversions: int, timeout: int, healthcheck_interval: int):
+        self.size = size
+        self.max_conversions = max_conversions
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._workers = []
+        self._slot_numbers = itertools.count()
+        self._disabled_until = 0
+
+    @property
+    def available(self) -> bool:
+        return self.size > 0 and time.monotonic() >= self._disabled_until
+
+    def _acquire(self) -> OfficeWorker:
+        try:
+            worker = self._idle.get_nowait()
+        except queue.Empty:
+            worker = None
+
+        if worker is not None:
+            if not worker.is_alive():
+                self._discard(worker)
+                worker = None
+            elif time.monotonic() - worker.last_used > self.healthcheck_interval:
+                try:
+                    worker.request(self.timeout, cmd="ping")
+                except OfficeConversionError:
+                    logger.warning("LibreOffice #%s не отвечает, перезапуск", worker.slot)
+                    self._discard(worker)
+                    worker = None
+
+        if worker is None:
+            worker = OfficeWorker(next(self._slot_numbers))
+            with self._lock:
+                self._workers.append(worker)
+            try:
+                worker.start(self.timeout)
+            except (OfficeConversionError, OSError) as e:
+                self._discard(worker)
+                # Не пытаемся поднимать пул на каждом запросе, если LibreOffice/uno недоступны
+                self._disabled_until = time.monotonic() + 60
+                raise OfficeConversionError(str(e))
+        return worker
+
+    def _release(self, worker: OfficeWorker):
+        if worker.conversions >= self.max_conversions:
+            self._discard(worker, wait=False)
+            return
+        self._idle.put(worker)
+
+    def _discard(self, worker: OfficeWorker, wait: bool = True):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if wait:
+            worker.stop()
+        else:
+            # Отработавший экземпляр завершаем в фоне, чтобы не задерживать запрос
+            threading.Thread(target=worker.stop, daemon=True).start()
+
+    def convert(self, src_path: str, dst_path: str):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise OfficeConversionError("Нет свободных экземпляров LibreOffice")
+        try:
+            worker = self._acquire()
+            try:
+                worker.request(self.timeout, cmd="convert", src=src_path, dst=dst_path)
+            except OfficeConversionError:
+                self._discard(worker, wait=False)
+                raise
+            worker.conversions += 1
+            self._release(worker)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            self._discard(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_pid = None
+
+
+def get_office_pool() -> LibreOfficePool:
+    """Пул создаётся на процесс: после fork (gunicorn, celery) у потомка будет свой."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = LibreOfficePool(
+                size=settings.LIBREOFFICE_POOL_SIZE,
+                max_conversions=settings.LIBREOFFICE_MAX_CONVERSIONS,
+                timeout=settings.LIBREOFFICE_CONVERSION_TIMEOUT,
+                healthcheck_interval=settings.LIBREOFFICE_HEALTHCHECK_INTERVAL,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@atexit.register
+def shutdown_office_pool():
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown()
+
+
+def convert_with_soffice(src_path: str, output_dir: str):
+    """Разовый запуск soffice --convert-to, если пул недоступен."""
+    subprocess.run(
+        [get_soffice_binary(), "--headless", "--convert-to", "pdf", "--outdir", output_dir, src_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        timeout=settings.LIBREOFFICE_CONVERSION_TIMEOUT * 2,
+        check=False,
+    )
+
+
+def convert_docx_to_pdf(src_path: str, output_dir: str) -> str:
+    """
+    Конвертирует документ в PDF и возвращает путь к результату.
+    Сначала пробует пул LibreOffice, при ошибке - разовый запуск soffice.
+    """
+    dst_path = os.path.join(output_dir, os.path.splitext(os.path.basename(src_path))[0] + ".pdf")
+    pool = get_office_pool()
+    if pool.available:
+        try:
+            pool.convert(src_path, dst_path)
+            return dst_path
+        except OfficeConversionError as e:
+            logger.warning("Пул LibreOffice недоступен, разовая конвертация: %s", e)
+    convert_with_soffice(src_path, output_dir)
+    return dst_path
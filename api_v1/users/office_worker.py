@@ -0,0 +1,141 @@
+"""
+Процесс-обёртка над одним экземпляром LibreOffice.
+
+Запускается пулом из api_v1/users/office.py интерпретатором, в котором доступен
+модуль uno (LIBREOFFICE_PYTHON), поэтому не импортирует Django.
+Поднимает soffice, слушающий именованный канал, подключается к нему через UNO
+и обрабатывает команды, приходящие построчно в stdin в формате JSON:
+
+    {"cmd": "convert", "src": "/path/file.docx", "dst": "/path/file.pdf"}
+    {"cmd": "ping"}
+    {"cmd": "quit"}
+
+На каждую команду отвечает одной строкой JSON в stdout: {"ok": true} или
+{"ok": false, "error": "..."}. После успешного старта печатает {"ready": true}.
+"""
+import json
+import subprocess
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+CONNECT_TIMEOUT = 60
+
+
+def make_properties(**kwargs):
+    properties = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+
+def start_office(soffice: str, profile_dir: str, pipe_name: str):
+    return subprocess.Popen(
+        [
+            soffice,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--nodefault",
+            "--norestore",
+            "--nolockcheck",
+            f"-env:UserInstallation={uno.systemPathToFileUrl(profile_dir)}",
+            f"--accept=pipe,name={pipe_name};urp;StarOffice.ComponentContext",
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def connect(office, pipe_name: str):
+    local_context = uno.getComponentContext()
+    resolver = local_context.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_context
+    )
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        if office.poll() is not None:
+            raise RuntimeError("soffice завершился при запуске")
+        try:
+            context = resolver.resolve(
+                f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext"
+            )
+            break
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+    return context.ServiceManager.createInstanceWithContext(
+        "com.sun.star.frame.Desktop", context
+    )
+
+
+def convert(desktop, src: str, dst: str):
+    document = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(src), "_blank", 0, make_properties(Hidden=True)
+    )
+    try:
+        document.storeToURL(
+            uno.systemPathToFileUrl(dst),
+            make_properties(FilterName="writer_pdf_Export"),
+        )
+    finally:
+        document.close(True)
+
+
+def reply(**payload):
+    sys.stdout.write(json.dumps(payload) + "\n")
+    sys.stdout.flush()
+
+
+def main(soffice: str, profile_dir: str, pipe_name: str):
+    office = start_office(soffice, profile_dir, pipe_name)
+    try:
+        desktop = connect(office, pipe_name)
+    except Exception as e:
+        office.kill()
+        reply(ready=False, error=str(e))
+        return 1
+    reply(ready=True)
+
+    for line in sys.stdin:
+        try:
+            command = json.loads(line)
+        except ValueError:
+            reply(ok=False, error="Некорректная команда")
+            continue
+        cmd = command.get("cmd")
+        try:
+            if cmd == "convert":
+                convert(desktop, command["src"], command["dst"])
+            elif cmd == "ping":
+                desktop.getCurrentComponent()
+            elif cmd == "quit":
+                break
+            else:
+                reply(ok=False, error=f"Неизвестная команда {cmd}")
+                continue
+        except Exception as e:
+            reply(ok=False, error=str(e))
+            continue
+        reply(ok=True)
+
+    try:
+        desktop.terminate()
+    except Exception:
+        pass
+    try:
+        office.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        office.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:4]))
@@ -0,0 +1,243 @@
+"""
+Встроенное формирование PDF из простых DOCX-шаблонов без LibreOffice.
+
+Поддерживаются документы из одного раздела, состоящие из абзацев с
+обычным/жирным/курсивным/подчёркнутым текстом и встроенных (inline)
+изображений, например согласия на обработку данных. Для остальных
+шаблонов render_docx_to_pdf выбрасывает UnsupportedDocumentError, и
+документ конвертируется через LibreOffice.
+"""
+import io
+import os
+import re
+import tempfile
+import threading
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.text.run import Run
+from PIL import Image as PILImage
+from PIL import ImageDraw
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+FONT_NAME = "Calibri"
+FONT_FILES = {
+    "Calibri": "calibri.ttf",
+    "Calibri-Bold": "calibri_bold.ttf",
+    "Calibri-Italic": "Calibri_italic.ttf",
+    "Calibri-BoldItalic": "Calibri_italic_bold.ttf",
+}
+# Символы, которых нет в Calibri (в шаблонах они набраны Segoe UI Symbol),
+# рисуются картинкой: символ -> есть ли галочка в квадрате
+SYMBOL_IMAGES = {
+    "☑": True,
+    "☐": False,
+}
+SYMBOL_IMAGE_SIZE = 64
+
+EMU_PER_POINT = 12700
+DEFAULT_FONT_SIZE = 11
+# одинарный интервал Word для Calibri
+LINE_HEIGHT = 1.22
+
+ALIGNMENTS = {
+    WD_ALIGN_PARAGRAPH.CENTER: TA_CENTER,
+    WD_ALIGN_PARAGRAPH.RIGHT: TA_RIGHT,
+    WD_ALIGN_PARAGRAPH.JUSTIFY: TA_JUSTIFY,
+}
+IMAGE_ALIGNMENTS = {
+    TA_CENTER: "CENTER",
+    TA_RIGHT: "RIGHT",
+}
+
+_fonts_lock = threading.Lock()
+_font_glyphs = None
+
+
+class UnsupportedDocumentError(Exception):
+    pass
+
+
+def register_fonts() -> set[int]:
+    """Регистрирует Calibri в reportlab и возвращает коды символов, которые есть в шрифте."""
+    global _font_glyphs
+    with _fonts_lock:
+        if _font_glyphs is None:
+            font_dir = os.path.join(settings.BASE_DIR, "fonts", "Calibri")
+            for name, filename in FONT_FILES.items():
+                pdfmetrics.registerFont(TTFont(name, os.path.join(font_dir, filename)))
+            pdfmetrics.registerFontFamily(
+                FONT_NAME,
+                normal="Calibri",
+                bold="Calibri-Bold",
+                italic="Calibri-Italic",
+                boldItalic="Calibri-BoldItalic",
+            )
+            _font_glyphs = set(pdfmetrics.getFont(FONT_NAME).face.charToGlyph)
+        return _font_glyphs
+
+
+def get_symbol_image(char: str) -> str:
+    """PNG с квадратом (и галочкой) для символа из SYMBOL_IMAGES, создаётся один раз."""
+    path = os.path.join(settings.DOCUMENT_IMAGE_CACHE_DIR, f"symbol_{ord(char):x}.png")
+    if os.path.exists(path):
+        return path
+    size = SYMBOL_IMAGE_SIZE
+    image = PILImage.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((4, 4, size - 5, size - 5), outline="black", width=4)
+    if SYMBOL_IMAGES[char]:
+        draw.line(
+            [(14, size // 2), (size * 0.42, size - 16), (size - 13, 14)],
+            fill="black",
+            width=6,
+            joint="curve",
+        )
+    os.makedirs(settings.DOCUMENT_IMAGE_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=settings.DOCUMENT_IMAGE_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as tmp:
+        image.save(tmp, format="PNG")
+    os.replace(tmp_path, path)
+    return path
+
+
+def check_supported(document):
+    if len(document.sections) != 1:
+        raise UnsupportedDocumentError("несколько разделов")
+    for child in document.element.body.iterchildren():
+        if child.tag not in (qn("w:p"), qn("w:sectPr")):
+            raise UnsupportedDocumentError(f"элемент {child.tag}")
+    if document.element.body.find(".//" + qn("wp:anchor")) is not None:
+        raise UnsupportedDocumentError("плавающие изображения")
+    section = document.sections[0]
+    for part in (section.header, section.footer):
+        if any(paragraph.text.strip() for paragraph in part.paragraphs) or part.tables:
+            raise UnsupportedDocumentError("колонтитулы")
+
+
+def get_default_font_size(document) -> float:
+    size = document.styles["Normal"].font.size
+    if size is not None:
+        return size.pt
+    default = document.styles.element.find(
+        f"{qn('w:docDefaults')}/{qn('w:rPrDefault')}/{qn('w:rPr')}/{qn('w:sz')}"
+    )
+    if default is not None:
+        return int(default.get(qn("w:val"))) / 2
+    return DEFAULT_FONT_SIZE
+
+
+def run_markup(run: Run, glyphs: set[int], font_size: float) -> str:
+    text = run.text
+    if not text:
+        return ""
+    # reportlab схлопывает пробелы, повторные заменяются неразрывными
+    text = re.sub(" (?= )", "\xa0", text.replace("\t", "\xa0" * 4))
+    parts = []
+    for char in text:
+        if char == "\n":
+            parts.append("<br/>")
+        elif ord(char) not in glyphs and char in SYMBOL_IMAGES:
+            size = (run.font.size.pt if run.font.size else font_size) * 0.8
+            parts.append(
+                f'<img src="{escape(get_symbol_image(char))}" width="{size}" height="{size}" valign="-1"/>'
+            )
+        else:
+            parts.append(escape(char))
+    markup = "".join(parts)
+    if run.font.size is not None:
+        markup = f'<font size="{run.font.size.pt}">{markup}</font>'
+    if run.underline:
+        markup = f"<u>{markup}</u>"
+    if run.italic:
+        markup = f"<i>{markup}</i>"
+    if run.bold:
+        markup = f"<b>{markup}</b>"
+    return markup
+
+
+def run_images(run: Run):
+    """Встроенные изображения run: (данные, ширина, высота в пунктах)."""
+    for inline in run._r.iter(qn("wp:inline")):
+        blip = inline.find(".//" + qn("a:blip"))
+        extent = inline.find(qn("wp:extent"))
+        if blip is None or extent is None:
+            continue
+        part = run.part.related_parts[blip.get(qn("r:embed"))]
+        yield (
+            part.blob,
+            int(extent.get("cx")) / EMU_PER_POINT,
+            int(extent.get("cy")) / EMU_PER_POINT,
+        )
+
+
+def paragraph_flowables(paragraph, font_size: float, glyphs: set[int]) -> list:
+    fmt = paragraph.paragraph_format
+    alignment = ALIGNMENTS.get(paragraph.alignment, TA_LEFT)
+    style = ParagraphStyle(
+        "docx",
+        fontName=FONT_NAME,
+        fontSize=font_size,
+        leading=font_size * LINE_HEIGHT,
+        alignment=alignment,
+        firstLineIndent=fmt.first_line_indent.pt if fmt.first_line_indent else 0,
+        leftIndent=fmt.left_indent.pt if fmt.left_indent else 0,
+        spaceBefore=fmt.space_before.pt if fmt.space_before else 0,
+        spaceAfter=fmt.space_after.pt if fmt.space_after else 0,
+    )
+
+    flowables = []
+    markup = []
+
+    def flush():
+        text = "".join(markup)
+        if text.strip():
+            flowables.append(Paragraph(text, style))
+        markup.clear()
+
+    # runs внутри гиперссылок тоже учитываются
+    for r in paragraph._p.iter(qn("w:r")):
+        run = Run(r, paragraph)
+        images = list(run_images(run))
+        if images:
+            flush()
+            for blob, width, height in images:
+                image = Image(io.BytesIO(blob), width=width, height=height)
+                image.hAlign = IMAGE_ALIGNMENTS.get(alignment, "LEFT")
+                flowables.append(image)
+        markup.append(run_markup(run, glyphs, font_size))
+    flush()
+
+    if not flowables:
+        flowables.append(Spacer(1, font_size * LINE_HEIGHT))
+    return flowables
+
+
+def render_docx_to_pdf(document) -> io.BytesIO:
+    """Формирует PDF из python-docx документа (например, DocxTemplate.docx после render)."""
+    check_supported(document)
+    glyphs = register_fonts()
+    font_size = get_default_font_size(document)
+    section = document.sections[0]
+
+    flowables = []
+    for paragraph in document.paragraphs:
+        flowables.extend(paragraph_flowables(paragraph, font_size, glyphs))
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(
+        buffer,
+        pagesize=(section.page_width / EMU_PER_POINT, section.page_height / EMU_PER_POINT),
+        leftMargin=section.left_margin / EMU_PER_POINT,
+        rightMargin=section.right_margin / EMU_PER_POINT,
+        topMargin=section.top_margin / EMU_PER_POINT,
+        bottomMargin=section.bottom_margin / EMU_PER_POINT,
+    ).build(flowables)
+    buffer.seek(0)
+    return buffer
@@ -1,10 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.urls import reverse
 
 from api_v1.fields import Base64FileField
-from api_v1.serializers import VersionedModelSerializer
-from users.choices import CandidateStatus
-from users.models import Candidate, CandidateCitizenship, CandidateEducation, CandidateEmployment, CandidateFamilyMember, CandidateOtherDocument, CandidateRecommendation
+from api_v1.serializers import SparseFieldsSerializerMixin, VersionedModelSerializer
+from users.choices import CandidateStatus, DocumentJobStatus, DocumentKind
+from users.models import Candidate, CandidateCitizenship, CandidateDocumentJob, CandidateEducation, CandidateEmployment, CandidateFamilyMember, CandidateOtherDocument, CandidateRecommendation
 
 User = get_user_model()
 
@@ -86,6 +88,50 @@ class CandidateOtherDocumentSerializer(serializers.ModelSerializer):
         exclude = ("candidate",)
     
     
+def update_nested(instance, related_name: str, items: list[dict]) -> bool:
+    """
+    Приводит вложенные записи кандидата к переданному списку: записи без id или
+    с чужим id создаются одним bulk_create, изменённые поля существующих
+    записей сохраняются одним bulk_update, отсутствующие в списке удаляются
+    одним запросом. Возвращает True, если что-то изменилось.
+
+    На коллекцию уходит не больше четырёх запросов независимо от числа записей
+    (bulk-операции могут разбиваться на пакеты по ограничениям СУБД).
+    """
+    manager = getattr(instance, related_name)
+    model = manager.model
+    existing = {obj.id: obj for obj in manager.all()}
+    to_create, to_update, changed_fields, kept_ids = [], [], set(), set()
+
+    for item in items:
+        item = dict(item)
+        obj = existing.get(item.pop("id", None))
+        if obj is None:
+            to_create.append(model(**{manager.field.name: instance}, **item))
+            continue
+        kept_ids.add(obj.id)
+        changed = [attr for attr, value in item.items() if getattr(obj, attr) != value]
+        if not changed:
+            continue
+        for attr in changed:
+            setattr(obj, attr, item[attr])
+            field = model._meta.get_field(attr)
+            if isinstance(field, models.FileField):
+                # bulk_update не вызывает pre_save, новый файл сохраняется здесь
+                setattr(obj, field.attname, field.pre_save(obj, add=False))
+        to_update.append(obj)
+        changed_fields.update(changed)
+
+    if to_create:
+        model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, sorted(changed_fields))
+    removed_ids = existing.keys() - kept_ids
+    if removed_ids:
+        model.objects.filter(id__in=removed_ids).delete()
+    return bool(to_create or to_update or removed_ids)
+
+
 class CandidateSerializer(VersionedModelSerializer):
     photo = Base64FileField(use_url=True, required=False, allow_null=True)
     signature = Base64FileField(use_url=True, required=False, allow_null=True)
@@ -151,6 +197,15 @@ class CandidateSerializer(VersionedModelSerializer):
             "other_documents",
             "version"
         )
+
+    NESTED_RELATIONS = (
+        "educations",
+        "employments",
+        "family_members",
+        "recommendations",
+        "citizenships",
+        "other_documents",
+    )
         
     def validate(self, attrs):
         forbidden = {"organization", "organization_email", "department", "vacancy"}
@@ -159,46 +214,28 @@ class CandidateSerializer(VersionedModelSerializer):
                 raise serializers.ValidationError({field: "Это поле только для чтения"})
         return attrs
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        educations_data = validated_data.pop("educations", [])
-        employments_data = validated_data.pop("employments", [])
-        family_members_data = validated_data.pop("family_members", [])
-        recommendations_data = validated_data.pop("recommendations", [])
-        citizenships_data = validated_data.pop("citizenships", [])
-        other_documents_data = validated_data.pop("other_documents", [])
+        nested_data = {
+            related_name: validated_data.pop(related_name, [])
+            for related_name in self.NESTED_RELATIONS
+        }
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
-
-        def update_nested(instance, nested_data, related_name, model_class):
-            existing_objs = {obj.id: obj for obj in getattr(instance, related_name).all()}
-            payload_ids = []
-
-            for item in nested_data:
-                obj_id = item.get("id")
-                if obj_id and obj_id in existing_objs:
-                    obj = existing_objs[obj_id]
-                    for attr, value in item.items():
-                        if attr != "id":
-                            setattr(obj, attr, value)
-                    obj.save()
-                    payload_ids.append(obj_id)
-                else:
-                    item.pop("id", None)
-                    model_class.objects.create(candidate=instance, **item)
-
-            for obj_id, obj in existing_objs.items():
-                if obj_id not in payload_ids:
-                    obj.delete()
-
-
-        update_nested(instance, educations_data, "educations", CandidateEducation)
-        update_nested(instance, employments_data, "employments", CandidateEmployment)
-        update_nested(instance, family_members_data, "family_members", CandidateFamilyMember)
-        update_nested(instance, recommendations_data, "recommendations", CandidateRecommendation)
-        update_nested(instance, citizenships_data, "citizenships", CandidateCitizenship)
-        update_nested(instance, other_documents_data, "other_documents", CandidateOtherDocument)
+
+        nested_changed = False
+        for related_name, items in nested_data.items():
+            nested_changed |= update_nested(instance, related_name, items)
+
+        # bulk-операции не отправляют сигналов вложенных записей, поэтому при их
+        # изменении версия кандидата увеличивается, даже если его поля не менялись:
+        # это проверка expected_version (при конфликте всё откатывается) и сброс
+        # кэша документов через post_save кандидата
+        if nested_changed and instance.get_changed_fields() == []:
+            instance.save(update_fields=["version"])
+        else:
+            instance.save()
 
         return instance
     
@@ -225,7 +262,7 @@ class CandidateCreateSerializer(serializers.ModelSerializer):
         ).data
 
 
-class CandidateListSerializer(serializers.ModelSerializer):
+class CandidateListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     organization = serializers.CharField(source="vacancy.department.organization.name")
     organization_id = serializers.IntegerField(source="vacancy.department.organization.id")
     department = serializers.CharField(source="vacancy.department.name")
@@ -257,9 +294,10 @@ class CandidateListSerializer(serializers.ModelSerializer):
             "language",
             "other_documents"
         )
+        expandable_fields = ("other_documents",)
 
 
-class CandidateDetailSerializer(serializers.ModelSerializer):
+class CandidateDetailSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     photo = Base64FileField(use_url=True)
     educations = CandidateEducationSerializer(many=True, read_only=True)
     employments = CandidateEmploymentSerializer(many=True, read_only=True)
@@ -324,6 +362,14 @@ class CandidateDetailSerializer(serializers.ModelSerializer):
             "other_documents",
             "version"
         )
+        expandable_fields = (
+            "recommendations",
+            "educations",
+            "employments",
+            "family_members",
+            "citizenships",
+            "other_documents",
+        )
     
     
 class CandidatePartialUpdateSerializer(serializers.ModelSerializer):
@@ -348,3 +394,42 @@ class CandidatePartialUpdateSerializer(serializers.ModelSerializer):
         if value == CandidateStatus.ANONYMIZED:
             raise serializers.ValidationError("Нельзя устанавливать статус ANONYMIZED через этот метод")
         return value
+
+
+class CandidateBulkQuestionnaireSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+
+class CandidateDocumentJobCreateSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=DocumentKind.choices)
+
+
+class CandidateDocumentJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CandidateDocumentJob
+        fields = (
+            "id",
+            "candidate",
+            "kind",
+            "status",
+            "progress",
+            "error",
+            "failed_candidate_ids",
+            "created_at",
+            "finished_at",
+            "download_url",
+        )
+        read_only_fields = fields
+
+    def get_download_url(self, obj) -> str | None:
+        if obj.status != DocumentJobStatus.SUCCESS:
+            return None
+        url = reverse("document_job-download", kwargs={"pk": obj.pk})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from api_v1.users.views import CandidateLinkCheckAPIView, CandidateProfileDetailAPIView, CandidateViewSet, CustomTokenRefreshView, ForgotPasswordAPIView, LoginAPIView, LogoutAPIView, ResetPasswordAPIView, SetPasswordAPIView
+from api_v1.users.views import CandidateDocumentJobViewSet, CandidateLinkCheckAPIView, CandidateProfileDetailAPIView, CandidateViewSet, CustomTokenRefreshView, ForgotPasswordAPIView, LoginAPIView, LogoutAPIView, ResetPasswordAPIView, SetPasswordAPIView
 
 router = DefaultRouter()
 router.register("candidates", CandidateViewSet, basename="candidat")
+router.register("document_jobs", CandidateDocumentJobViewSet, basename="document_job")
 
 
 urlpatterns = [
@@ -1,19 +1,35 @@
 import io
+import logging
 import os
-import platform
 import tempfile
 import zipfile
 
-from openpyxl.cell.cell import MergedCell
 from openpyxl.styles import Alignment
 from copy import copy
 from openpyxl.drawing.image import Image as XLImage
 from PIL import Image as PILImage
-from openpyxl import load_workbook
 from django.db.models import Case, When, Value, IntegerField
 
 from django.conf import settings
-from docxtpl import DocxTemplate
+from docx.shared import Mm
+from docxtpl import DocxTemplate, InlineImage
+
+from users.document_cache import document_cache
+from users.image_cache import get_document_image
+from api_v1.users.office import convert_docx_to_pdf
+from api_v1.users.pdf_render import UnsupportedDocumentError, render_docx_to_pdf
+from api_v1.users.xlsx_templates import (
+    add_merged_range,
+    get_anchor_index,
+    get_merged_cell_index,
+    get_xlsx_template,
+    shift_anchor_index,
+    shift_merged_cell_index,
+)
+from users.choices import CommunicationLanguage, DocumentKind
+from users.models import Candidate
+
+logger = logging.getLogger(__name__)
 
 RU_MONTHS = {
     1: "января",
@@ -64,26 +80,20 @@ FR_MONTHS = {
 class DocumentService:
     path = str(settings.BASE_DIR) + os.sep
 
-    def get_doc_pdf(self, context: dict, docx_temp: DocxTemplate):
+    def get_doc_pdf(self, context: dict, docx_temp: DocxTemplate, native: bool = False):
         file_name = "temporary_file"
-        pdf_bytes = io.BytesIO()
         docx_temp.render(context)
-        docs_dir = tempfile.TemporaryDirectory(prefix=self.path)
-        docx_temp.save(os.path.join(docs_dir.name, f"{file_name}.docx"))
-        file_path = os.path.join(docs_dir.name, f"{file_name}.docx")
-        output_dir = os.path.join(docs_dir.name)
-        if platform.system().lower() == "windows":
-            os.system(
-                f"C:\Program^ Files\LibreOffice\program\soffice --headless --convert-to pdf --outdir {output_dir} {file_path}"
-            )
-        elif platform.system().lower() == "linux":
-            os.system(
-                f"soffice --headless --convert-to pdf --outdir {output_dir} {file_path}"
-            )
-        with open(
-            os.path.join(docs_dir.name, f"{file_name}.pdf"), "rb"
-        ) as pdf:
-            pdf_bytes = io.BytesIO(pdf.read())
+        if native:
+            try:
+                return render_docx_to_pdf(docx_temp.docx)
+            except UnsupportedDocumentError as e:
+                logger.info("Шаблон не подходит для встроенного формирования PDF: %s", e)
+        with tempfile.TemporaryDirectory(prefix=self.path) as docs_dir:
+            file_path = os.path.join(docs_dir, f"{file_name}.docx")
+            docx_temp.save(file_path)
+            pdf_path = convert_docx_to_pdf(file_path, docs_dir)
+            with open(pdf_path, "rb") as pdf:
+                pdf_bytes = io.BytesIO(pdf.read())
         return pdf_bytes
 
     def get_bytes_stream(self, relative_path: str):
@@ -93,19 +103,19 @@ class DocumentService:
 
 
 def write_cell(ws, row: int, col: int, value: str):
-    cell = ws.cell(row=row, column=col)
-
-    if isinstance(cell, MergedCell):
-        for merged_range in ws.merged_cells.ranges:
-            if cell.coordinate in merged_range:
-                ws.cell(
-                    row=merged_range.min_row,
-                    column=merged_range.min_col
-                ).value = value
-                return
-
-    cell.value = value
-    
+    # значение объединённой ячейки хранится в верхней левой
+    top_left = get_merged_cell_index(ws).get(row, col)
+    if top_left:
+        row, col = top_left
+    ws.cell(row=row, column=col).value = value
+
+
+def merge_range(ws, start_row: int, start_column: int, end_row: int, end_column: int):
+    """Объединяет ячейки и обновляет индекс объединённых ячеек листа."""
+    ws.merge_cells(start_row=start_row, start_column=start_column, end_row=end_row, end_column=end_column)
+    add_merged_range(ws, start_column, start_row, end_column, end_row)
+
+
 def split_text(text: str, max_len: int, max_lines: int):
     """
     Делит текст на max_lines строк, каждая не длиннее max_len,
@@ -146,10 +156,61 @@ def split_text(text: str, max_len: int, max_lines: int):
     return lines[:max_lines]
 
 
+# Объединения ячеек в строках таблиц анкет: пары (первый, последний) столбец
+EDUCATION_MERGES_RU = ((1, 5), (6, 7), (8, 9), (10, 12), (13, 14))
+EMPLOYMENT_MERGES_RU = ((2, 4), (5, 7), (8, 9), (10, 12), (13, 14))
+RECOMMENDATION_MERGES_RU = ((1, 14),)
+FAMILY_MERGES = ((1, 3), (4, 6), (7, 10), (11, 14))
+EDUCATION_MERGES_FOREIGN = ((1, 5), (6, 7), (8, 12), (13, 14))
+EMPLOYMENT_MERGES_FOREIGN = ((1, 2), (3, 6), (7, 12), (13, 14))
+RECOMMENDATION_MERGES_FOREIGN = ((1, 4), (5, 8), (9, 11), (12, 14))
+
+
+def insert_rows(ws, row: int, amount: int = 1, merges: tuple = ()):
+    """
+    Вставляет amount строк на позицию row одним сдвигом ячеек.
+    Объединения и высоты строк ниже переносятся за один проход, новые строки
+    получают стиль и высоту строки row - 1 и объединения по merges.
+    """
+    if amount <= 0:
+        return
+
+    ws.insert_rows(row, amount)
+    shift_anchor_index(ws, row, amount)
+    shift_merged_cell_index(ws, row, amount)
+
+    # хэш диапазона зависит от границ, поэтому множество собирается заново
+    ranges = list(ws.merged_cells.ranges)
+    for merged_range in ranges:
+        if merged_range.min_row >= row:
+            merged_range.shift(0, amount)
+    ws.merged_cells.ranges = set(ranges)
+
+    # openpyxl не сдвигает высоты строк при вставке
+    dimensions = ws.row_dimensions
+    for index in sorted((i for i in dimensions if i >= row), reverse=True):
+        dimension = dimensions.pop(index)
+        dimension.index = index + amount
+        dimensions[index + amount] = dimension
+
+    template_height = dimensions[row - 1].height if row - 1 in dimensions else None
+    template_cells = [
+        cell for cell in ws[row - 1] if cell.has_style
+    ] if row > 1 else []
+    for new_row in range(row, row + amount):
+        for source in template_cells:
+            ws.cell(row=new_row, column=source.column)._style = copy(source._style)
+        if template_height is not None:
+            dimensions[new_row].height = template_height
+        for start_col, end_col in merges:
+            merge_range(ws, start_row=new_row, start_column=start_col, end_row=new_row, end_column=end_col)
+
+
 def write_merged_cell(ws, row: int, start_col: int, value: str, merge_cols: int = 1):
     if merge_cols > 1:
         end_col = start_col + merge_cols - 1
-        ws.merge_cells(
+        merge_range(
+            ws,
             start_row=row,
             start_column=start_col,
             end_row=row,
@@ -158,50 +219,18 @@ def write_merged_cell(ws, row: int, start_col: int, value: str, merge_cols: int
     ws.cell(row=row, column=start_col).value = value
     
     
-def insert_education_row_ru(ws, row):
+def insert_education_row_ru(ws, row, amount: int = 1):
     """
-    Вставляет пустую строку для образования на позицию row,
+    Вставляет amount пустых строк для образования на позицию row,
     копирует стиль предыдущей строки и объединяет ячейки
     """
-    # Сохраняем merge диапазоны
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем пустую строку
-    ws.insert_rows(row)
-
-    # Сдвигаем merge диапазоны вниз
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row-1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединяем ячейки под образование
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=5)  # A-E
-    ws.merge_cells(start_row=row, start_column=6, end_row=row, end_column=7)  # F-G
-    ws.merge_cells(start_row=row, start_column=8, end_row=row, end_column=9)  # H-I
-    ws.merge_cells(start_row=row, start_column=10, end_row=row, end_column=12)  # J-L
-    ws.merge_cells(start_row=row, start_column=13, end_row=row, end_column=14)  # M-N
-
-    return row 
-
-
-def insert_employment_row_ru(ws, row: int):
+    insert_rows(ws, row, amount, EDUCATION_MERGES_RU)
+    return row
+
+
+def insert_employment_row_ru(ws, row: int, amount: int = 1):
     """
-    Вставляет строку для трудовой деятельности на позицию row.
+    Вставляет amount строк для трудовой деятельности на позицию row.
     Копирует стиль предыдущей строки и объединяет ячейки под колонки таблицы.
     Таблица трудовой деятельности:
     Дата приема A
@@ -211,75 +240,15 @@ def insert_employment_row_ru(ws, row: int):
     ФИО руководителя J-L
     Причина увольнения M-N
     """
-    # Сохраняем merge диапазоны
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем пустую строку
-    ws.insert_rows(row)
-
-    # Сдвигаем merge диапазоны вниз
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row-1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединяем ячейки под колонки таблицы трудовой деятельности
-    ws.merge_cells(start_row=row, start_column=2, end_row=row, end_column=4)   # Дата увольнения
-    ws.merge_cells(start_row=row, start_column=5, end_row=row, end_column=7)   # Должность, организация
-    ws.merge_cells(start_row=row, start_column=8, end_row=row, end_column=9)   # Адрес, телефон организации
-    ws.merge_cells(start_row=row, start_column=10, end_row=row, end_column=12) # ФИО руководителя
-    ws.merge_cells(start_row=row, start_column=13, end_row=row, end_column=14) # Причина увольнения
-    
-    
-def insert_recommendation_row_ru(ws, row: int):
+    insert_rows(ws, row, amount, EMPLOYMENT_MERGES_RU)
+
+
+def insert_recommendation_row_ru(ws, row: int, amount: int = 1):
     """
-    Вставляет строку для рекомендации на позицию row.
+    Вставляет amount строк для рекомендаций на позицию row.
     Копирует стиль предыдущей строки и объединяет ячейки под всю таблицу рекомендаций (A-N)
     """
-    from copy import copy
-
-    # Сохраняем merge диапазоны
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем пустую строку
-    ws.insert_rows(row)
-
-    # Сдвигаем merge диапазоны вниз
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row-1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединяем ячейки под всю таблицу рекомендаций A-N
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=14)
+    insert_rows(ws, row, amount, RECOMMENDATION_MERGES_RU)
 
 
 def write_recommendation_cell(ws, row: int, text: str, max_chars_per_line=75, line_height=11):
@@ -288,7 +257,7 @@ def write_recommendation_cell(ws, row: int, text: str, max_chars_per_line=75, li
     включает перенос текста и динамически подстраивает высоту строки.
     """
     # Объединяем ячейки A-N
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=14)
+    merge_range(ws, start_row=row, start_column=1, end_row=row, end_column=14)
 
     cell = ws.cell(row=row, column=1)
     cell.value = text
@@ -301,57 +270,17 @@ def write_recommendation_cell(ws, row: int, text: str, max_chars_per_line=75, li
     ws.row_dimensions[row].height = max(line_height, lines_count * line_height)
     
     
-def insert_family_row(ws, row: int):
+def insert_family_row(ws, row: int, amount: int = 1):
     """
-    Вставляет строку для таблицы «Состав семьи».
+    Вставляет amount строк для таблицы «Состав семьи».
     Копирует стиль предыдущей строки и объединяет ячейки по шаблону:
     A-C | D-F | G-J | K-N
     """
-    from copy import copy
-
-    # Сохраняем merge диапазоны
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем строку
-    ws.insert_rows(row)
-
-    # Корректно сдвигаем merge диапазоны
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row - 1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединения ячеек по шаблону таблицы семьи
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=3)    # A–C Степень родства
-    ws.merge_cells(start_row=row, start_column=4, end_row=row, end_column=6)    # D–F Год рождения
-    ws.merge_cells(start_row=row, start_column=7, end_row=row, end_column=10)   # G–J Род деятельности
-    ws.merge_cells(start_row=row, start_column=11, end_row=row, end_column=14)  # K–N Место проживания
-
-
-def find_row_by_text(ws, needle: str) -> int | None:
-    needle = needle.lower().strip()
-
-    for i, row in enumerate(ws.iter_rows(), start=1):
-        for cell in row:
-            if cell.value:
-                text = str(cell.value).lower().replace("\n", " ")
-                if needle in text and text.startswith(needle):
-                    return i
-    return None
+    insert_rows(ws, row, amount, FAMILY_MERGES)
+
+
+def find_row_by_text(ws, needle: str, column: int | None = None) -> int | None:
+    return get_anchor_index(ws).find(ws, needle.lower().strip(), column)
 
 
 def write_answer_block(
@@ -389,13 +318,11 @@ def write_created_at(ws, candidate):
     Ищет строку с кавычками в ячейке A (игнорируем пробелы) 
     и заполняет день, месяц и год.
     """
-    target_row = None
-    for i, row in enumerate(ws.iter_rows(values_only=True), start=1):
-        if row and row[0]:
-            cell_val = str(row[0]).replace(" ", "")
-            if cell_val.count('"') == 2:
-                target_row = i
-                break
+    target_row = get_anchor_index(ws).find_first(
+        ws,
+        lambda text: text.replace(" ", "").count('"') == 2,
+        column=1
+    )
 
     if not target_row or not candidate.created_at:
         return
@@ -409,9 +336,9 @@ def write_created_at(ws, candidate):
 
     # Записываем
     ws.cell(row=target_row, column=1).value = f'"{day}"'
-    ws.merge_cells(start_row=target_row, start_column=2, end_row=target_row, end_column=5)
+    merge_range(ws, start_row=target_row, start_column=2, end_row=target_row, end_column=5)
     ws.cell(row=target_row, column=2).value = month_name
-    ws.merge_cells(start_row=target_row, start_column=6, end_row=target_row, end_column=7)
+    merge_range(ws, start_row=target_row, start_column=6, end_row=target_row, end_column=7)
     ws.cell(row=target_row, column=6).value = str(year)
     if candidate.signature:
         insert_signature(ws, candidate.signature.path, target_row)
@@ -422,7 +349,9 @@ def insert_signature(ws, signature_path: str, row: int, target_width: int = 100)
     Вставляет подпись в указанную строку в диапазон K-N,
     масштабируя пропорционально по ширине.
     """
-    # Читаем оригинальное изображение, чтобы знать его размеры
+    signature_path = get_document_image(signature_path)
+
+    # Читаем изображение, чтобы знать его размеры
     with PILImage.open(signature_path) as pil_img:
         orig_width, orig_height = pil_img.size
 
@@ -445,7 +374,9 @@ def insert_candidate_photo(ws, photo_path: str, start_row: int = 2, end_row: int
     Вставляет фото кандидата в указанный диапазон (по умолчанию L2:N9),
     масштабируя пропорционально по ширине.
     """
-    # Читаем оригинальное изображение
+    photo_path = get_document_image(photo_path)
+
+    # Читаем изображение
     with PILImage.open(photo_path) as pil_img:
         orig_width, orig_height = pil_img.size
 
@@ -464,8 +395,22 @@ def insert_candidate_photo(ws, photo_path: str, start_row: int = 2, end_row: int
     ws.add_image(img, cell_address)
 
 
+def save_workbook(wb):
+    """
+    Сохраняет книгу в буфер: в памяти до XLSX_SPOOL_MAX_SIZE_MB, дальше во
+    временном файле, который удаляется при закрытии буфера.
+    """
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.XLSX_SPOOL_MAX_SIZE_MB * 1024 * 1024,
+        suffix=".xlsx",
+    )
+    wb.save(output)
+    output.seek(0)
+    return output
+
+
 def get_questionnaire_ru_xlsx(candidate, template):
-    wb = load_workbook(template)
+    wb = get_xlsx_template(template).open()
     ws = wb.active
     citizenship = candidate.citizenships.first()
     if citizenship:
@@ -506,25 +451,24 @@ def get_questionnaire_ru_xlsx(candidate, template):
     num_educations = educations.count()
     extra_rows_needed = max(0, num_educations - 4)
 
-    for i in range(extra_rows_needed):
-        insert_education_row_ru(ws, start_row + 4 + i)
+    insert_education_row_ru(ws, start_row + 4, extra_rows_needed)
 
     for idx, edu in enumerate(educations):
         row = start_row + idx
         ws.cell(row=row, column=1).value = edu.institution_name_and_location  
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=5)
+        merge_range(ws, start_row=row, start_column=1, end_row=row, end_column=5)
 
         ws.cell(row=row, column=6).value = edu.graduation_date.strftime("%m/%Y")
-        ws.merge_cells(start_row=row, start_column=6, end_row=row, end_column=7)
+        merge_range(ws, start_row=row, start_column=6, end_row=row, end_column=7)
 
         ws.cell(row=row, column=8).value = edu.get_education_form_display()
-        ws.merge_cells(start_row=row, start_column=8, end_row=row, end_column=9)
+        merge_range(ws, start_row=row, start_column=8, end_row=row, end_column=9)
 
         ws.cell(row=row, column=10).value = edu.specialty
-        ws.merge_cells(start_row=row, start_column=10, end_row=row, end_column=12)
+        merge_range(ws, start_row=row, start_column=10, end_row=row, end_column=12)
 
         ws.cell(row=row, column=13).value = edu.diploma_information
-        ws.merge_cells(start_row=row, start_column=13, end_row=row, end_column=14)
+        merge_range(ws, start_row=row, start_column=13, end_row=row, end_column=14)
 
     end_of_education_row = start_row + max(num_educations, 4)
     start_employment_row = end_of_education_row + 2
@@ -538,22 +482,21 @@ def get_questionnaire_ru_xlsx(candidate, template):
     ).order_by('-current_job', '-end_date', '-start_date')
     num_employments = employments.count()
     extra_rows_needed = max(0, num_employments - 7)
-    for i in range(extra_rows_needed):
-        insert_employment_row_ru(ws, start_employment_row + 5 + i)
+    insert_employment_row_ru(ws, start_employment_row + 5, extra_rows_needed)
 
     for idx, emp in enumerate(employments):
         row = start_employment_row + idx
         ws.cell(row=row, column=1).value = emp.start_date.strftime("%m/%Y") if emp.start_date else ""
         ws.cell(row=row, column=2).value = emp.end_date.strftime("%m/%Y") if emp.end_date else ""
-        ws.merge_cells(start_row=row, start_column=2, end_row=row, end_column=4)
+        merge_range(ws, start_row=row, start_column=2, end_row=row, end_column=4)
         ws.cell(row=row, column=5).value = emp.position_and_organization
-        ws.merge_cells(start_row=row, start_column=5, end_row=row, end_column=7)
+        merge_range(ws, start_row=row, start_column=5, end_row=row, end_column=7)
         ws.cell(row=row, column=8).value = emp.organization_address_and_phone
-        ws.merge_cells(start_row=row, start_column=8, end_row=row, end_column=9)
+        merge_range(ws, start_row=row, start_column=8, end_row=row, end_column=9)
         ws.cell(row=row, column=10).value = emp.manager_full_name
-        ws.merge_cells(start_row=row, start_column=10, end_row=row, end_column=12)
+        merge_range(ws, start_row=row, start_column=10, end_row=row, end_column=12)
         ws.cell(row=row, column=13).value = emp.dismissal_reason
-        ws.merge_cells(start_row=row, start_column=13, end_row=row, end_column=14)
+        merge_range(ws, start_row=row, start_column=13, end_row=row, end_column=14)
     end_of_employment_row = start_employment_row + max(num_employments, 7)
 
     start_foreign_languages_row = end_of_employment_row + 1 
@@ -566,10 +509,9 @@ def get_questionnaire_ru_xlsx(candidate, template):
         write_cell(ws, start_foreign_languages_row + i, 1, line)
     for i in range(4):
         ws.row_dimensions[start_foreign_languages_row + i].height = first_row_height
-    for i, row in enumerate(ws.iter_rows(values_only=True), start=1):
-        if row and row[0] and "Рекомендации с предыдущих мест работы" in str(row[0]):
-            recommendations_start_row = i + 1 
-            break
+    recommendations_row = find_row_by_text(ws, "Рекомендации с предыдущих мест работы", column=1)
+    if recommendations_row:
+        recommendations_start_row = recommendations_row + 1
     else:
         recommendations_start_row = ws.max_row + 1
 
@@ -577,34 +519,31 @@ def get_questionnaire_ru_xlsx(candidate, template):
     num_recommendations = recommendations.count()
     extra_rows_needed = max(0, num_recommendations - 4)
 
-    for i in range(extra_rows_needed):
-        insert_recommendation_row_ru(ws, recommendations_start_row + 4 + i)
+    insert_recommendation_row_ru(ws, recommendations_start_row + 4, extra_rows_needed)
 
     for idx, rec in enumerate(recommendations):
         row = recommendations_start_row + idx
         write_recommendation_cell(ws, row, rec.text)
         
-    for i, row in enumerate(ws.iter_rows(values_only=True), start=1):
-        if row and row[0] and "Состав семьи, близкие родственники" in str(row[0]):
-            family_start_row = i + 2
-            break
+    family_row = find_row_by_text(ws, "Состав семьи, близкие родственники", column=1)
+    if family_row:
+        family_start_row = family_row + 2
     else:
         family_start_row = ws.max_row + 1
     family_members = candidate.family_members.all()
     num_family = family_members.count()
     extra_rows_needed = max(0, num_family - 8)
-    for i in range(extra_rows_needed):
-        insert_family_row(ws, family_start_row + 8 + i)
+    insert_family_row(ws, family_start_row + 8, extra_rows_needed)
     for idx, member in enumerate(family_members):
         row = family_start_row + idx
         ws.cell(row=row, column=1).value = member.relation
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=3)
+        merge_range(ws, start_row=row, start_column=1, end_row=row, end_column=3)
         ws.cell(row=row, column=4).value = member.birth_year
-        ws.merge_cells(start_row=row, start_column=4, end_row=row, end_column=6)
+        merge_range(ws, start_row=row, start_column=4, end_row=row, end_column=6)
         ws.cell(row=row, column=7).value = member.occupation
-        ws.merge_cells(start_row=row, start_column=7, end_row=row, end_column=10)
+        merge_range(ws, start_row=row, start_column=7, end_row=row, end_column=10)
         ws.cell(row=row, column=11).value = member.residence
-        ws.merge_cells(start_row=row, start_column=11, end_row=row, end_column=14)
+        merge_range(ws, start_row=row, start_column=11, end_row=row, end_column=14)
 
     write_answer_block(
         ws,
@@ -637,7 +576,8 @@ def get_questionnaire_ru_xlsx(candidate, template):
 
     if driver_row:
         ws.cell(row=driver_row, column=8).value = candidate.driver_license_number
-        ws.merge_cells(
+        merge_range(
+            ws,
             start_row=driver_row,
             start_column=8,
             end_row=driver_row,
@@ -647,7 +587,8 @@ def get_questionnaire_ru_xlsx(candidate, template):
             candidate.driver_license_issue_date.strftime("%d/%m/%Y")
             if candidate.driver_license_issue_date else ""
         )
-        ws.merge_cells(
+        merge_range(
+            ws,
             start_row=driver_row,
             start_column=13,
             end_row=driver_row,
@@ -656,7 +597,8 @@ def get_questionnaire_ru_xlsx(candidate, template):
 
         categories_row = driver_row + 1
         ws.cell(row=categories_row, column=6).value = candidate.driver_license_categories
-        ws.merge_cells(
+        merge_range(
+            ws,
             start_row=categories_row,
             start_column=6,
             end_row=categories_row,
@@ -714,10 +656,7 @@ def get_questionnaire_ru_xlsx(candidate, template):
     write_created_at(ws, candidate)
     if candidate.photo:
         insert_candidate_photo(ws, candidate.photo.path)
-    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
-    wb.save(tmp.name)
-    tmp.seek(0)
-    return tmp
+    return save_workbook(wb)
 
 
 def write_basic_info_foreign(ws, candidate):
@@ -752,45 +691,14 @@ def write_basic_info_foreign(ws, candidate):
     # D-N
         
         
-def insert_education_row_foreign(ws, row):
+def insert_education_row_foreign(ws, row, amount: int = 1):
     """
-    Вставляет пустую строку для образования на позицию row,
+    Вставляет amount пустых строк для образования на позицию row,
     копирует стиль предыдущей строки и объединяет ячейки
     """
-    # Сохраняем merge диапазоны
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем пустую строку
-    ws.insert_rows(row)
-
-    # Сдвигаем merge диапазоны вниз
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row-1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединяем ячейки под образование
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=5)  # A-E
-    ws.merge_cells(start_row=row, start_column=6, end_row=row, end_column=7)  # F-G
-    ws.merge_cells(start_row=row, start_column=8, end_row=row, end_column=12)  # H-L
-    ws.merge_cells(start_row=row, start_column=13, end_row=row, end_column=14)  # M-N
-
-    return row 
-        
+    insert_rows(ws, row, amount, EDUCATION_MERGES_FOREIGN)
+    return row
+
 
 def write_education(ws, candidate, search_string):
     header_row = find_row_by_text(ws, search_string)
@@ -802,8 +710,7 @@ def write_education(ws, candidate, search_string):
 
     base_rows = 4
     if len(educations) > base_rows:
-        for i in range(len(educations) - base_rows):
-            insert_education_row_foreign(ws, start_row + base_rows + i)
+        insert_education_row_foreign(ws, start_row + base_rows, len(educations) - base_rows)
 
     for i, edu in enumerate(educations):
         row = start_row + i
@@ -813,37 +720,8 @@ def write_education(ws, candidate, search_string):
         write_cell(ws, row, 13, edu.diploma_information)           # M-N
         
         
-def insert_employment_row_foreign(ws, row: int):
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем пустую строку
-    ws.insert_rows(row)
-
-    # Сдвигаем merge диапазоны вниз
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row-1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединяем ячейки под колонки таблицы трудовой деятельности
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=2)
-    ws.merge_cells(start_row=row, start_column=3, end_row=row, end_column=6)   
-    ws.merge_cells(start_row=row, start_column=7, end_row=row, end_column=12)   
-    ws.merge_cells(start_row=row, start_column=13, end_row=row, end_column=14) 
+def insert_employment_row_foreign(ws, row: int, amount: int = 1):
+    insert_rows(ws, row, amount, EMPLOYMENT_MERGES_FOREIGN)
 
 
 def write_employment(ws, candidate, search_string):
@@ -862,8 +740,7 @@ def write_employment(ws, candidate, search_string):
 
     base_rows = 6
     if len(employments) > base_rows:
-        for i in range(len(employments) - base_rows):
-            insert_employment_row_foreign(ws, start_row + base_rows + i)
+        insert_employment_row_foreign(ws, start_row + base_rows, len(employments) - base_rows)
 
     for i, emp in enumerate(employments):
         row = start_row + i
@@ -880,44 +757,12 @@ def write_employment(ws, candidate, search_string):
         write_cell(ws, row, 13, emp.dismissal_reason)               # M-N
         
         
-def insert_recommendation_row_foreign(ws, row: int):
+def insert_recommendation_row_foreign(ws, row: int, amount: int = 1):
     """
-    Вставляет строку для рекомендации на позицию row.
-    Копирует стиль предыдущей строки и объединяет ячейки под всю таблицу рекомендаций (A-N)
+    Вставляет amount строк для рекомендаций на позицию row.
+    Копирует стиль предыдущей строки и объединяет ячейки под колонки таблицы рекомендаций
     """
-    from copy import copy
-
-    # Сохраняем merge диапазоны
-    merges = list(ws.merged_cells.ranges)
-
-    # Вставляем пустую строку
-    ws.insert_rows(row)
-
-    # Сдвигаем merge диапазоны вниз
-    ws.merged_cells.ranges = []
-    for m in merges:
-        min_col, min_row, max_col, max_row = m.bounds
-        if min_row >= row:
-            m.shift(0, 1)
-        ws.merged_cells.add(m)
-
-    # Копируем стиль с предыдущей строки
-    for col in range(1, ws.max_column + 1):
-        source = ws.cell(row=row-1, column=col)
-        target = ws.cell(row=row, column=col)
-        if source.has_style:
-            target.font = copy(source.font)
-            target.border = copy(source.border)
-            target.fill = copy(source.fill)
-            target.number_format = copy(source.number_format)
-            target.alignment = copy(source.alignment)
-            target.protection = copy(source.protection)
-
-    # Объединяем ячейки под всю таблицу рекомендаций A-N
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=4)
-    ws.merge_cells(start_row=row, start_column=5, end_row=row, end_column=8)
-    ws.merge_cells(start_row=row, start_column=9, end_row=row, end_column=11)
-    ws.merge_cells(start_row=row, start_column=12, end_row=row, end_column=14)
+    insert_rows(ws, row, amount, RECOMMENDATION_MERGES_FOREIGN)
 
 
 def write_references(ws, candidate, search_string):
@@ -933,8 +778,7 @@ def write_references(ws, candidate, search_string):
 
     base_rows = 3
     if len(refs) > base_rows:
-        for i in range(len(refs) - base_rows):
-            insert_recommendation_row_foreign(ws, start_row + base_rows + i)
+        insert_recommendation_row_foreign(ws, start_row + base_rows, len(refs) - base_rows)
 
     for i, ref in enumerate(refs):
         row = start_row + i
@@ -954,8 +798,7 @@ def write_family(ws, candidate, search_string):
 
     base_rows = 6
     if len(family) > base_rows:
-        for i in range(len(family) - base_rows):
-            insert_family_row(ws, start_row + base_rows + i)
+        insert_family_row(ws, start_row + base_rows, len(family) - base_rows)
 
     for i, member in enumerate(family):
         row = start_row + i
@@ -967,37 +810,39 @@ def write_family(ws, candidate, search_string):
          
 
 def write_questions_en(ws, candidate):
+    # в шаблонах ENG/FRA_2025 под каждым вопросом одна строка для ответа,
+    # следующие строки заняты следующим вопросом
     write_answer_block(
         ws,
         "Do you have any occupational health problems or a disability?",
         candidate.health_restrictions,
-        max_lines=2
+        max_lines=1
     )
     write_answer_block(ws, "How did you hear about us?", candidate.vacancy_source, 1)
     write_answer_block(
         ws,
         "Do you have any family members or close associates employed by the company? Ifyes, pleasespecify",
         candidate.acquaintances_in_company,
-        2
+        1
     )
-    write_answer_block(ws, "Do you have any specific employment requirements (e.g., work schedule)?", candidate.job_requirements, 2)
+    write_answer_block(ws, "Do you have any specific employment requirements (e.g., work schedule)?", candidate.job_requirements, 1)
     write_answer_block(
         ws,
         "Are there any factors that may affect your work performance? (Optional)",
         candidate.work_obstacles,
-        2
+        1
     )
     write_answer_block(
         ws,
         "Additional information you would like to provide (optional):",
         candidate.additional_info,
-        3
+        1
     )
     write_answer_block(ws, "Salary expectations (gross monthly salary):", candidate.salary_expectations, 1)
 
 
 def get_questionnaire_en_xlsx(candidate, template):
-    wb = load_workbook(template)
+    wb = get_xlsx_template(template).open()
     ws = wb.active
     write_basic_info_foreign(ws, candidate)
     write_education(ws, candidate, "education")
@@ -1009,44 +854,43 @@ def get_questionnaire_en_xlsx(candidate, template):
 
     if candidate.photo:
         insert_candidate_photo(ws, candidate.photo.path, start_row=3)
-    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
-    wb.save(tmp.name)
-    tmp.seek(0)
-    return tmp
+    return save_workbook(wb)
 
 
 def write_questions_fr(ws, candidate):
+    # в шаблонах ENG/FRA_2025 под каждым вопросом одна строка для ответа,
+    # следующие строки заняты следующим вопросом
     write_answer_block(
         ws,
         "Souffrez-vous d’une atteinte à la santé ou d’un handicap susceptible d’influencer l’exercice de l’activité professionnelle?",
         candidate.health_restrictions,
-        max_lines=2
+        max_lines=1
     )
     write_answer_block(ws, "Comment avez-vous pris connaissance de notre offre d’emploi?", candidate.vacancy_source, 1)
     write_answer_block(
         ws,
         "Avez-vous des amis ou des members de votre famille qui travaillent dans notre entreprise?",
         candidate.acquaintances_in_company,
-        2
+        1
     )
-    write_answer_block(ws, "Avez-vous des demandes supplémentaires?", candidate.job_requirements, 2)
+    write_answer_block(ws, "Avez-vous des demandes supplémentaires?", candidate.job_requirements, 1)
     write_answer_block(
         ws,
         "Notez, s'il vous plait, les facteurs qui peuvent être des soucis pour le travail:",
         candidate.work_obstacles,
-        2
+        1
     )
     write_answer_block(
         ws,
         "Y a-t-il d’autres informations vous concernant que vous souhaitez partager?",
         candidate.additional_info,
-        3
+        1
     )
     write_answer_block(ws, "Prétentions salariales:", candidate.salary_expectations, 1)
 
 
 def get_questionnaire_fr_xlsx(candidate, template):
-    wb = load_workbook(template)
+    wb = get_xlsx_template(template).open()
     ws = wb.active
     write_basic_info_foreign(ws, candidate)
     write_education(ws, candidate, "formation")
@@ -1058,7 +902,207 @@ def get_questionnaire_fr_xlsx(candidate, template):
 
     if candidate.photo:
         insert_candidate_photo(ws, candidate.photo.path, start_row=3)
-    tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
-    wb.save(tmp.name)
-    tmp.seek(0)
-    return tmp
\ No newline at end of file
+    return save_workbook(wb)
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+DOCUMENT_TEMPLATES = {
+    DocumentKind.QUESTIONNAIRE_PDF: {
+        CommunicationLanguage.RU: "Анкета_ru.docx",
+        CommunicationLanguage.EN: "Анкета_en.docx",
+        CommunicationLanguage.FR: "Анкета_fr.docx",
+    },
+    DocumentKind.CONSENT_PDF: {
+        CommunicationLanguage.RU: "Текст для согласия рус.docx",
+        CommunicationLanguage.EN: "Текст для согласия англ.docx",
+        CommunicationLanguage.FR: "Текст для согласия франц.docx",
+    },
+    DocumentKind.QUESTIONNAIRE_XLSX: {
+        CommunicationLanguage.RU: "RUS_2025.xlsx",
+        CommunicationLanguage.EN: "ENG_2025.xlsx",
+        CommunicationLanguage.FR: "FRA_2025.xlsx",
+    },
+}
+
+
+def get_document_template_path(kind: str, language: str) -> str:
+    return os.path.join(settings.BASE_DIR, "templates", DOCUMENT_TEMPLATES[kind][language])
+
+
+def use_native_pdf(template_path: str) -> bool:
+    """Формировать ли PDF по шаблону без LibreOffice (NATIVE_PDF_TEMPLATES)."""
+    return os.path.basename(template_path) in settings.NATIVE_PDF_TEMPLATES
+
+
+def get_questionnaire_pdf(candidate, native: bool | None = None):
+    template_path = get_document_template_path(DocumentKind.QUESTIONNAIRE_PDF, candidate.language)
+    if native is None:
+        native = use_native_pdf(template_path)
+    tpl = DocxTemplate(template_path)
+    date = candidate.updated_at
+    photo = None
+    sign = None
+
+    if candidate.photo:
+        photo = InlineImage(
+            tpl,
+            get_document_image(candidate.photo.path),
+            width=Mm(24)
+        )
+
+    if candidate.signature:
+        sign = InlineImage(
+            tpl,
+            get_document_image(candidate.signature.path),
+            width=Mm(24)
+        )
+    allow_reference_check = ""
+    if candidate.allow_reference_check:
+        allow_reference_check = "Да"
+    if not candidate.allow_reference_check:
+        allow_reference_check = "Нет"
+    context = {
+        "candidate": candidate,
+        "day": date.day,
+        "year": date.year,
+        "photo": photo,
+        "signature": sign,
+        "allow_reference_check": allow_reference_check
+    }
+    if candidate.language == CommunicationLanguage.RU:
+        context["month"] = RU_MONTHS[date.month]
+    if candidate.language == CommunicationLanguage.FR:
+        context["month"] = FR_MONTHS[date.month]
+    if candidate.language == CommunicationLanguage.EN:
+        context["month"] = EN_MONTHS[date.month]
+    return DocumentService().get_doc_pdf(context, tpl, native)
+
+
+def get_consent_pdf(candidate, native: bool | None = None):
+    template_path = get_document_template_path(DocumentKind.CONSENT_PDF, candidate.language)
+    if native is None:
+        native = use_native_pdf(template_path)
+    tpl = DocxTemplate(template_path)
+    sign = None
+    if candidate.signature:
+        sign = InlineImage(
+            tpl,
+            get_document_image(candidate.signature.path),
+            width=Mm(24)
+        )
+    context = {
+        "candidate": candidate,
+        "signature": sign,
+    }
+    return DocumentService().get_doc_pdf(context, tpl, native)
+
+
+def get_questionnaire_xlsx(candidate):
+    template_path = get_document_template_path(DocumentKind.QUESTIONNAIRE_XLSX, candidate.language)
+    if candidate.language == CommunicationLanguage.RU:
+        return get_questionnaire_ru_xlsx(candidate, template_path)
+    if candidate.language == CommunicationLanguage.EN:
+        return get_questionnaire_en_xlsx(candidate, template_path)
+    if candidate.language == CommunicationLanguage.FR:
+        return get_questionnaire_fr_xlsx(candidate, template_path)
+
+
+def get_questionnaire_xlsx_filename(candidate) -> str:
+    if candidate.language == CommunicationLanguage.EN:
+        return f"Application_form_{candidate.last_name}_{candidate.first_name}.xlsx"
+    if candidate.language == CommunicationLanguage.FR:
+        return f"Formulaire_{candidate.last_name}_{candidate.first_name}.xlsx"
+    return f"Анкета_{candidate.last_name}_{candidate.first_name}.xlsx"
+
+
+def build_candidate_document(candidate, kind: str):
+    """Формирует документ кандидата без кэша. Возвращает открытый файловый объект."""
+    if kind == DocumentKind.QUESTIONNAIRE_PDF:
+        return get_questionnaire_pdf(candidate)
+    if kind == DocumentKind.CONSENT_PDF:
+        return get_consent_pdf(candidate)
+    if kind == DocumentKind.QUESTIONNAIRE_XLSX:
+        return get_questionnaire_xlsx(candidate)
+    raise ValueError(f"Неизвестный тип документа: {kind}")
+
+
+def get_candidate_document_filename(candidate, kind: str) -> tuple[str, str]:
+    """Имя файла и content-type документа."""
+    if kind == DocumentKind.QUESTIONNAIRE_PDF:
+        return "Анкета.pdf", "application/pdf"
+    if kind == DocumentKind.CONSENT_PDF:
+        return "Согласие на обработку персональных данных.pdf", "application/pdf"
+    if kind == DocumentKind.QUESTIONNAIRE_XLSX:
+        return get_questionnaire_xlsx_filename(candidate), XLSX_CONTENT_TYPE
+    raise ValueError(f"Неизвестный тип документа: {kind}")
+
+
+def get_document_cache_key(candidate, kind: str) -> tuple[str, str]:
+    """Ключ документа в кэше и расширение файла."""
+    filename, _ = get_candidate_document_filename(candidate, kind)
+    extension = os.path.splitext(filename)[1]
+    template_path = get_document_template_path(kind, candidate.language)
+    variant = "native" if extension == ".pdf" and use_native_pdf(template_path) else ""
+    return document_cache.make_key(candidate, kind, template_path, variant), extension
+
+
+def get_cached_candidate_document(candidate, kind: str) -> str:
+    """Путь к документу кандидата в кэше, при промахе документ формируется."""
+    key, extension = get_document_cache_key(candidate, kind)
+    path = document_cache.get(candidate.pk, key, extension)
+    if path is None:
+        with build_candidate_document(candidate, kind) as file:
+            path = document_cache.put(candidate.pk, key, extension, file)
+    return path
+
+
+def render_candidate_document(candidate, kind: str):
+    """
+    Возвращает документ кандидата из кэша, при промахе формирует и кэширует его.
+    Возвращает открытый файловый объект, имя файла и content-type.
+    """
+    filename, content_type = get_candidate_document_filename(candidate, kind)
+    key, extension = get_document_cache_key(candidate, kind)
+    path = document_cache.get(candidate.pk, key, extension)
+    if path is not None:
+        return open(path, "rb"), filename, content_type
+
+    # при промахе отдаём сформированный буфер, не перечитывая файл из кэша
+    file = build_candidate_document(candidate, kind)
+    try:
+        document_cache.put(candidate.pk, key, extension, file)
+        file.seek(0)
+    except BaseException:
+        file.close()
+        raise
+    return file, filename, content_type
+
+
+def write_candidate_documents_zip(target, candidates, kind: str, failed_ids=()) -> list[int]:
+    """
+    Записывает в target ZIP-архив с документами кандидатов. Документы берутся
+    из кэша, при промахе формируются в текущем процессе. Кандидаты из failed_ids
+    (их документ уже не удалось сформировать) и те, чей документ не удалось
+    сформировать здесь, перечисляются в errors.txt внутри архива, их id возвращаются.
+    """
+    failed_ids = set(failed_ids)
+    failed = []
+    with zipfile.ZipFile(target, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for candidate in candidates:
+            if candidate.pk in failed_ids:
+                failed.append(candidate)
+                continue
+            try:
+                filename, _ = get_candidate_document_filename(candidate, kind)
+                arcname = f"{candidate.pk}_{candidate.last_name}_{candidate.first_name}/{filename}"
+                archive.write(get_cached_candidate_document(candidate, kind), arcname)
+            except Exception:
+                logger.exception("Не удалось сформировать документ кандидата %s", candidate.pk)
+                failed.append(candidate)
+        if failed:
+            archive.writestr(
+                "errors.txt",
+                "Не удалось сформировать документы кандидатов:\n"
+                + "".join(f"{c.pk} {c.last_name} {c.first_name}\n" for c in failed),
+            )
+    return [candidate.pk for candidate in failed]
@@ -1,7 +1,3 @@
-import os
-
-from docxtpl import InlineImage, DocxTemplate
-from docx.shared import Mm 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
@@ -25,14 +21,17 @@ from rest_framework.exceptions import NotFound, PermissionDenied, Authentication
 
 from api_v1.auth_classes import CandidateJWTAuthentication
 from api_v1.mixins import CookiesTokenMixin, UpdateModelMixin
+from api_v1.pagination import CreatedAtCursorPagination
+from api_v1.serializers import SPARSE_FIELDS_PARAMETERS
 from api_v1.permissions import IsCandidateWithValidLink, IsHRPermission
 from api_v1.users.filters import CandidateFilter
-from api_v1.users.serializers import CandidateCreateSerializer, CandidateDetailSerializer, CandidateListSerializer, CandidatePartialUpdateSerializer, ResetPasswordSerializer, CandidateSerializer, ForgotPasswordSerializer, SetPasswordSerializer, UserLoginSerializer
-from api_v1.users.utils import RU_MONTHS, EN_MONTHS, FR_MONTHS, get_questionnaire_ru_xlsx, get_questionnaire_en_xlsx, get_questionnaire_fr_xlsx, DocumentService
+from api_v1.users.serializers import CandidateBulkQuestionnaireSerializer, CandidateCreateSerializer, CandidateDocumentJobCreateSerializer, CandidateDocumentJobSerializer, CandidateDetailSerializer, CandidateListSerializer, CandidatePartialUpdateSerializer, ResetPasswordSerializer, CandidateSerializer, ForgotPasswordSerializer, SetPasswordSerializer, UserLoginSerializer
+from api_v1.users.utils import render_candidate_document
 from api_v1.utils import generate_candidate_jwt_access_token, generate_candidate_jwt_refresh_token, candidate_token_generator
-from users.models import Candidate, CandidateRefreshToken
-from users.choices import CandidateStatus, CommunicationLanguage
-from users.tasks import send_reset_password_email_task, send_candidate_anonymization_email_task, send_candidate_questionnaire_task, send_reset_password_email_hr_task
+from core.models import VersionConflict
+from users.models import Candidate, CandidateDocumentJob, CandidateRefreshToken
+from users.choices import CandidateStatus, DocumentJobStatus, DocumentKind
+from users.tasks import export_candidate_documents_task, render_candidate_document_task, send_reset_password_email_task, send_candidate_anonymization_email_task, send_candidate_questionnaire_task, send_candidate_questionnaires_task, send_reset_password_email_hr_task
 from users.utils import anonymization_candidate_date, calculate_candidate_link_expiration, anonymize_name
 
 User = get_user_model()
@@ -225,15 +224,16 @@ class CandidateProfileDetailAPIView(APIView):
             return Response({"password_set": False}, status=200)
         serializer = CandidateSerializer(profile, data=request.data, partial=True, context={"request": self.request})
         serializer.is_valid(raise_exception=True)
-        if profile.version != request.data.get("version"):
+        # версия проверяется в том же UPDATE, что и запись анкеты,
+        # статус пишется тем же UPDATE
+        profile.expected_version = serializer.validated_data["version"]
+        try:
+            serializer.save(status=CandidateStatus.RECEIVED)
+        except VersionConflict:
             return Response(
                 {"detail": "Объект был изменён другим пользователем. Обновите сраницу."}, 
                 status=409
             )
-        serializer.save()
-        if profile.status != CandidateStatus.RECEIVED:
-            profile.status = CandidateStatus.RECEIVED
-            profile.save(update_fields=["status"])
         return Response(serializer.data, status=200)
 
 
@@ -372,6 +372,7 @@ class CandidateViewSet(
     queryset = Candidate.objects.all()
     filter_backends = [DjangoFilterBackend]
     filterset_class = CandidateFilter
+    pagination_class = CreatedAtCursorPagination
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -384,26 +385,24 @@ class CandidateViewSet(
             return CandidatePartialUpdateSerializer
         
     def get_queryset(self):
+        # столбцы и связи подбираются по полям из параметров fields/expand
         if self.action == 'list':
-            return Candidate.objects.select_related(
-                "vacancy",
-                "vacancy__department",
-                "vacancy__department__organization",
-            ).prefetch_related(
-                "other_documents"
+            # created_at нужен курсору пагинации
+            return CandidateListSerializer.optimize_queryset(
+                Candidate.objects.all(), self.request, required=("created_at",)
             )
         if self.action == 'retrieve':
+            return CandidateDetailSerializer.optimize_queryset(Candidate.objects.all(), self.request)
+        if self.action in (
+            "get_questionnaire_pdf",
+            "get_consent_pdf",
+            "get_questionnaire_xlsx",
+        ):
+            # vacancy и organization нужны и в документе, и в ключе кэша
             return Candidate.objects.select_related(
                 "vacancy",
                 "vacancy__department",
                 "vacancy__department__organization",
-            ).prefetch_related(
-                "educations",
-                "employments",
-                "family_members",
-                "citizenships",
-                "other_documents",
-                "recommendations",
             )
         return super().get_queryset()
     
@@ -424,7 +423,7 @@ class CandidateViewSet(
         
     @transaction.atomic
     def perform_update(self, serializer):
-        candidate = self.get_object()
+        candidate = serializer.instance
         new_email = serializer.validated_data.get("email")
         old_user = candidate.user
         if new_email and new_email != old_user.email:
@@ -441,111 +440,97 @@ class CandidateViewSet(
     @action(detail=True, methods=["get"])
     def get_questionnaire_pdf(self, request, pk=None):
         candidate = self.get_object()
-        path = str(settings.BASE_DIR) + os.sep
-        if candidate.language == CommunicationLanguage.RU:
-            tpl = DocxTemplate(
-                os.path.join(path, "templates", "Анкета_ru.docx")
-            )
-        if candidate.language == CommunicationLanguage.EN:
-            tpl = DocxTemplate(
-                os.path.join(path, "templates", "Анкета_en.docx")
-            )
-        if candidate.language == CommunicationLanguage.FR:
-            tpl = DocxTemplate(
-                os.path.join(path, "templates", "Анкета_fr.docx")
-            )
-        date = candidate.updated_at
-        photo = None
-        sign = None
-
-        if candidate.photo:
-            photo = InlineImage(
-                tpl,
-                candidate.photo.path,
-                width=Mm(24)
-            )
-
-        if candidate.signature:
-            sign = InlineImage(
-                tpl,
-                candidate.signature.path,
-                width=Mm(24) 
-            )
-        allow_reference_check = ""
-        if candidate.allow_reference_check:
-            allow_reference_check = "Да"
-        if not candidate.allow_reference_check:
-            allow_reference_check = "Нет"
-        context = {
-            "candidate": candidate,
-            "day": date.day,
-            "year": date.year,
-            "photo": photo,
-            "signature": sign,
-            "allow_reference_check": allow_reference_check
-        }
-        if candidate.language == CommunicationLanguage.RU:
-            context["month"] = RU_MONTHS[date.month]
-        if candidate.language == CommunicationLanguage.FR:
-            context["month"] = FR_MONTHS[date.month]
-        if candidate.language == CommunicationLanguage.EN:
-            context["month"] = EN_MONTHS[date.month]
-        pdf_bytes = DocumentService().get_doc_pdf(context, tpl)
+        pdf_bytes, filename, _ = render_candidate_document(candidate, DocumentKind.QUESTIONNAIRE_PDF)
         return FileResponse(
             pdf_bytes,
             as_attachment=True,
-            filename="Анкета.pdf",
+            filename=filename,
         )
         
     @action(detail=True, methods=["get"])
     def get_consent_pdf(self, request, pk=None):
         candidate = self.get_object()
-        path = str(settings.BASE_DIR) + os.sep
-        if candidate.language == CommunicationLanguage.RU:
-            tpl = DocxTemplate(os.path.join(path, "templates", "Текст для согласия рус.docx"))
-        if candidate.language == CommunicationLanguage.EN:
-            tpl = DocxTemplate(os.path.join(path, "templates", "Текст для согласия англ.docx"))
-        if candidate.language == CommunicationLanguage.FR:
-            tpl = DocxTemplate(os.path.join(path, "templates", "Текст для согласия франц.docx"))
-        sign = None
-        if candidate.signature:
-            sign = InlineImage(
-                tpl,
-                candidate.signature.path,
-                width=Mm(24) 
-            )
-        context = {
-            "candidate": candidate,
-            "signature": sign,
-        }
-        pdf_bytes = DocumentService().get_doc_pdf(context, tpl)
+        pdf_bytes, filename, _ = render_candidate_document(candidate, DocumentKind.CONSENT_PDF)
         return FileResponse(
             pdf_bytes,
             as_attachment=True,
-            filename="Согласие на обработку персональных данных.pdf",
+            filename=filename,
         )
 
     @action(detail=True, methods=["get"])
     def get_questionnaire_xlsx(self, request, pk=None):
         candidate = self.get_object()
-        if candidate.language == CommunicationLanguage.RU:
-            template_path = os.path.join(settings.BASE_DIR, "templates", "RUS_2025.xlsx")
-            tmp = get_questionnaire_ru_xlsx(candidate, template_path)
-            filename = f"Анкета_{candidate.last_name}_{candidate.first_name}.xlsx"
-        if candidate.language == CommunicationLanguage.EN:
-            template_path = os.path.join(settings.BASE_DIR, "templates", "ENG_2025.xlsx")
-            tmp = get_questionnaire_en_xlsx(candidate, template_path)
-            filename = f"Application_form_{candidate.last_name}_{candidate.first_name}.xlsx"
-        if candidate.language == CommunicationLanguage.FR:
-            template_path = os.path.join(settings.BASE_DIR, "templates", "FRA_2025.xlsx")
-            tmp = get_questionnaire_fr_xlsx(candidate, template_path)
-            filename = f"Formulaire_{candidate.last_name}_{candidate.first_name}.xlsx"
-
+        file, filename, content_type = render_candidate_document(candidate, DocumentKind.QUESTIONNAIRE_XLSX)
         return FileResponse(
-            open(tmp.name, "rb"),
+            file,
             as_attachment=True,
             filename=filename,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            content_type=content_type
+        )
+
+    @extend_schema(
+        description=(
+            "Постановка в очередь выгрузки документов отфильтрованных кандидатов "
+            "одним ZIP-архивом. Принимает те же параметры фильтрации, что и список "
+            "кандидатов, в теле - kind, тип документа. Возвращает задание, статус "
+            "которого можно получить по document_jobs/{id}/; кандидаты, документы "
+            "которых не удалось сформировать, перечислены в failed_candidate_ids "
+            "и в errors.txt внутри архива. За раз выгружается не больше "
+            "DOCUMENT_EXPORT_MAX_CANDIDATES кандидатов. Доступно hr специалистам."
+        ),
+        request=CandidateDocumentJobCreateSerializer,
+        responses={202: CandidateDocumentJobSerializer},
+    )
+    @action(detail=False, methods=["post"])
+    def export_documents(self, request):
+        serializer = CandidateDocumentJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        max_candidates = settings.DOCUMENT_EXPORT_MAX_CANDIDATES
+        candidate_ids = list(
+            self.filter_queryset(self.get_queryset()).order_by().values_list("id", flat=True)[:max_candidates + 1]
+        )
+        if not candidate_ids:
+            return Response({"detail": "Кандидаты не найдены"}, status=status.HTTP_404_NOT_FOUND)
+        if len(candidate_ids) > max_candidates:
+            return Response(
+                {"detail": f"Можно выгрузить не больше {max_candidates} кандидатов, уточните фильтры"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        with transaction.atomic():
+            job = CandidateDocumentJob.objects.create(
+                kind=serializer.validated_data["kind"],
+                created_by=request.user,
+            )
+            job.candidates.set(candidate_ids)
+            transaction.on_commit(lambda: export_candidate_documents_task.delay(job.id))
+        return Response(
+            CandidateDocumentJobSerializer(job, context={"request": request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @extend_schema(
+        description=(
+            "Постановка в очередь формирования документа кандидата. "
+            "Возвращает задание, статус которого можно получить по document_jobs/{id}/. "
+            "Доступно hr специалистам."
+        ),
+        request=CandidateDocumentJobCreateSerializer,
+        responses={202: CandidateDocumentJobSerializer},
+    )
+    @action(detail=True, methods=["post"])
+    def render_document(self, request, pk=None):
+        candidate = self.get_object()
+        serializer = CandidateDocumentJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = CandidateDocumentJob.objects.create(
+            candidate=candidate,
+            kind=serializer.validated_data["kind"],
+            created_by=request.user,
+        )
+        transaction.on_commit(lambda: render_candidate_document_task.delay(job.id))
+        return Response(
+            CandidateDocumentJobSerializer(job, context={"request": request}).data,
+            status=status.HTTP_202_ACCEPTED
         )
 
     @extend_schema(
@@ -561,6 +546,34 @@ class CandidateViewSet(
         #     return Response({"detail": "Анкета уже отправлена"}, status=status.HTTP_400_BAD_REQUEST)
         send_candidate_questionnaire_task.delay(candidate.id)
         return Response({"detail": "Анкета успешно отправлена"}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        description=(
+            "Отправка ссылок на анкету нескольким кандидатам одной задачей. "
+            "Доступно hr специалистам."
+        ),
+        request=CandidateBulkQuestionnaireSerializer,
+        responses=inline_serializer(
+            name="BulkQuestionnaireSchema",
+            fields={"detail": serializers.CharField(), "count": serializers.IntegerField()},
+        ),
+    )
+    @action(detail=False, methods=["post"])
+    def send_questionnaires(self, request):
+        serializer = CandidateBulkQuestionnaireSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        candidate_ids = list(
+            self.get_queryset()
+            .filter(id__in=serializer.validated_data["ids"])
+            .values_list("id", flat=True)
+        )
+        if not candidate_ids:
+            return Response({"detail": "Кандидаты не найдены"}, status=status.HTTP_404_NOT_FOUND)
+        send_candidate_questionnaires_task.delay(candidate_ids)
+        return Response(
+            {"detail": "Анкеты поставлены в очередь на отправку", "count": len(candidate_ids)},
+            status=status.HTTP_200_OK,
+        )
     
     @extend_schema(
         description=(
@@ -577,16 +590,20 @@ class CandidateViewSet(
 
     @extend_schema(
         description=(
-            "Получение списка кандидатов. Доступно hr специалистам."
-        )
+            "Получение списка кандидатов. Параметр fields ограничивает поля ответа, "
+            "expand - вложенные списки. Доступно hr специалистам."
+        ),
+        parameters=SPARSE_FIELDS_PARAMETERS,
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
     @extend_schema(
         description=(
-            "Получение информации о кандидате. Доступно hr специалистам."
-        )
+            "Получение информации о кандидате. Параметр fields ограничивает поля ответа, "
+            "expand - вложенные списки. Доступно hr специалистам."
+        ),
+        parameters=SPARSE_FIELDS_PARAMETERS,
     )
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
@@ -639,3 +656,41 @@ class CandidateLinkCheckAPIView(APIView):
             },
             status=status.HTTP_200_OK
         )
+
+
+@extend_schema(tags=["Candidates"])
+class CandidateDocumentJobViewSet(
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet
+):
+    permission_classes = [IsAuthenticated, IsHRPermission]
+    serializer_class = CandidateDocumentJobSerializer
+    queryset = CandidateDocumentJob.objects.all()
+
+    @extend_schema(
+        description=(
+            "Получение статуса задания на формирование документа. Доступно hr специалистам."
+        )
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @extend_schema(
+        description=(
+            "Скачивание сформированного документа. Доступно hr специалистам."
+        ),
+        responses={200: None},
+    )
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != DocumentJobStatus.SUCCESS or not job.file:
+            return Response(
+                {"detail": "Документ ещё не сформирован"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=job.file_name,
+        )
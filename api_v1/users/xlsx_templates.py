@@ -0,0 +1,214 @@
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from copy import deepcopy
+from weakref import WeakKeyDictionary
+
+from openpyxl import load_workbook
+from openpyxl.utils.indexed_list import IndexedList
+
+# Индексы листов: строятся при первом обращении или копируются из реестра
+_anchor_indexes = WeakKeyDictionary()
+_merged_cell_indexes = WeakKeyDictionary()
+
+
+def normalize_text(value) -> str:
+    return str(value).lower().replace("\n", " ")
+
+
+def get_cell_text(ws, row: int, column: int) -> str:
+    # ячейка могла быть перезаписана после построения индекса
+    value = ws.cell(row=row, column=column).value
+    return normalize_text(value) if value else ""
+
+
+class AnchorIndex:
+    """
+    Индекс текстов ячеек листа, строится одним проходом.
+    Поиск по началу текста идёт бинарным поиском по отсортированным текстам,
+    при вставке строк номера строк в индексе сдвигаются. Записи в ячейки индекс
+    не отслеживает, поэтому найденная ячейка сверяется с текущим значением на листе.
+    """
+
+    def __init__(self, cells: list[list], keys: list[tuple] | None = None):
+        # [номер строки, номер столбца, текст] в порядке обхода листа
+        self.cells = cells
+        # (текст, позиция в cells), отсортированы по тексту
+        if keys is None:
+            keys = sorted((text, position) for position, (_, _, text) in enumerate(cells))
+        self.keys = keys
+
+    @classmethod
+    def build(cls, ws) -> "AnchorIndex":
+        cells = []
+        for row_number, row in enumerate(ws.iter_rows(values_only=True), start=1):
+            for column, value in enumerate(row, start=1):
+                if value:
+                    cells.append([row_number, column, normalize_text(value)])
+        return cls(cells)
+
+    def copy(self) -> "AnchorIndex":
+        # позиции не меняются при сдвиге строк, поэтому keys общие
+        return AnchorIndex([list(cell) for cell in self.cells], self.keys)
+
+    def find(self, ws, prefix: str, column: int | None = None) -> int | None:
+        """Первая по листу строка, в которой текст ячейки начинается с prefix."""
+        positions = []
+        i = bisect_left(self.keys, (prefix,))
+        while i < len(self.keys) and self.keys[i][0].startswith(prefix):
+            position = self.keys[i][1]
+            if column is None or self.cells[position][1] == column:
+                positions.append(position)
+            i += 1
+        for position in sorted(positions):
+            row, cell_column, _ = self.cells[position]
+            if get_cell_text(ws, row, cell_column).startswith(prefix):
+                return row
+        return None
+
+    def find_first(self, ws, predicate, column: int | None = None) -> int | None:
+        for row, cell_column, text in self.cells:
+            if (
+                (column is None or cell_column == column)
+                and predicate(text)
+                and predicate(get_cell_text(ws, row, cell_column))
+            ):
+                return row
+        return None
+
+    def shift(self, row: int, amount: int):
+        for cell in self.cells:
+            if cell[0] >= row:
+                cell[0] += amount
+
+
+def get_anchor_index(ws) -> AnchorIndex:
+    index = _anchor_indexes.get(ws)
+    if index is None:
+        index = AnchorIndex.build(ws)
+        _anchor_indexes[ws] = index
+    return index
+
+
+def shift_anchor_index(ws, row: int, amount: int = 1):
+    """Сдвигает индекс после вставки amount строк на позицию row."""
+    index = _anchor_indexes.get(ws)
+    if index is not None:
+        index.shift(row, amount)
+
+
+class MergedCellIndex:
+    """
+    Карта (строка, столбец) -> (строка, столбец) верхней левой ячейки для всех
+    ячеек объединённых диапазонов листа, кроме самих верхних левых.
+    """
+
+    def __init__(self, cells: dict):
+        self.cells = cells
+
+    @classmethod
+    def build(cls, ws) -> "MergedCellIndex":
+        index = cls({})
+        for merged_range in ws.merged_cells.ranges:
+            index.add(*merged_range.bounds)
+        return index
+
+    def copy(self) -> "MergedCellIndex":
+        return MergedCellIndex(dict(self.cells))
+
+    def add(self, min_col: int, min_row: int, max_col: int, max_row: int):
+        top_left = (min_row, min_col)
+        for row in range(min_row, max_row + 1):
+            for column in range(min_col, max_col + 1):
+                if (row, column) != top_left:
+                    self.cells[row, column] = top_left
+
+    def get(self, row: int, column: int) -> tuple[int, int] | None:
+        return self.cells.get((row, column))
+
+    def shift(self, row: int, amount: int):
+        # диапазоны сдвигаются целиком, если начинаются не выше row
+        shifted = {}
+        for (cell_row, column), (top_row, top_column) in self.cells.items():
+            if top_row >= row:
+                shifted[cell_row + amount, column] = (top_row + amount, top_column)
+            else:
+                shifted[cell_row, column] = (top_row, top_column)
+        self.cells = shifted
+
+
+def get_merged_cell_index(ws) -> MergedCellIndex:
+    index = _merged_cell_indexes.get(ws)
+    if index is None:
+        index = MergedCellIndex.build(ws)
+        _merged_cell_indexes[ws] = index
+    return index
+
+
+def add_merged_range(ws, min_col: int, min_row: int, max_col: int, max_row: int):
+    index = _merged_cell_indexes.get(ws)
+    if index is not None:
+        index.add(min_col, min_row, max_col, max_row)
+
+
+def shift_merged_cell_index(ws, row: int, amount: int = 1):
+    index = _merged_cell_indexes.get(ws)
+    if index is not None:
+        index.shift(row, amount)
+
+
+def copy_workbook(workbook):
+    """
+    Глубокая копия книги openpyxl. Обычный deepcopy даёт сломанную книгу:
+    IndexedList теряет элементы (словарь индекса восстанавливается раньше списка
+    и append их пропускает), а row_dimensions/column_dimensions - default_factory.
+    """
+    memo = {}
+    for value in vars(workbook).values():
+        if isinstance(value, IndexedList):
+            memo[id(value)] = IndexedList(deepcopy(list(value), memo))
+    copied = deepcopy(workbook, memo)
+    for ws, copied_ws in zip(workbook._sheets, copied._sheets):
+        for name, value in vars(ws).items():
+            if isinstance(value, defaultdict):
+                getattr(copied_ws, name).default_factory = deepcopy(value.default_factory, memo)
+    return copied
+
+
+class XlsxTemplate:
+    """
+    Шаблон анкеты, разобранный один раз на процесс.
+    Хранит нетронутую книгу и индексы текстов и объединённых ячеек активного листа,
+    каждый рендер получает собственную копию.
+    """
+
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.path = path
+        self.marker = (stat.st_mtime_ns, stat.st_size)
+        self.workbook = load_workbook(path)
+        self.anchor_index = AnchorIndex.build(self.workbook.active)
+        self.merged_cell_index = MergedCellIndex.build(self.workbook.active)
+
+    def open(self):
+        workbook = copy_workbook(self.workbook)
+        _anchor_indexes[workbook.active] = self.anchor_index.copy()
+        _merged_cell_indexes[workbook.active] = self.merged_cell_index.copy()
+        return workbook
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_xlsx_template(path: str) -> XlsxTemplate:
+    """Шаблон из реестра; перечитывается, если файл на диске изменился."""
+    stat = os.stat(path)
+    marker = (stat.st_mtime_ns, stat.st_size)
+    with _templates_lock:
+        template = _templates.get(path)
+        if template is None or template.marker != marker:
+            template = XlsxTemplate(path)
+            _templates[path] = template
+        return template
@@ -21,4 +21,12 @@ app.conf.beat_schedule = {
         "task": "users.tasks.daily_anonymization_task",
         "schedule": crontab(hour=12, minute=0),
     },
+    "hourly-document-jobs-cleanup": {
+        "task": "users.tasks.cleanup_document_jobs_task",
+        "schedule": crontab(minute=30),
+    },
+    "document-cache-cleanup": {
+        "task": "users.tasks.cleanup_document_cache_task",
+        "schedule": crontab(minute="*/10"),
+    },
 }
\ No newline at end of file
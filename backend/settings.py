@@ -109,6 +109,9 @@ if DEBUG:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # тестовая база создаётся по моделям: старые миграции positions
+            # не применяются к пустой базе
+            "TEST": {"MIGRATE": False},
         }
     }
 else:
@@ -274,6 +277,20 @@ SPECTACULAR_SETTINGS = {
     ],
 }
 
+if DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/1"),
+        }
+    }
+
 CELERY_BROKER_URL = os.getenv(
     'CELERY_BROKER_URL', 
     'redis://localhost:6379'
@@ -293,6 +310,74 @@ CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_TASK_TRACK_STARTED = True
 CELERY_RESULT_EXPIRES = 3600
 
+# Пул LibreOffice для конвертации DOCX -> PDF (0 - запуск soffice на каждый документ)
+LIBREOFFICE_POOL_SIZE = int(os.getenv("LIBREOFFICE_POOL_SIZE", "2"))
+LIBREOFFICE_MAX_CONVERSIONS = int(os.getenv("LIBREOFFICE_MAX_CONVERSIONS", "200"))
+LIBREOFFICE_CONVERSION_TIMEOUT = int(os.getenv("LIBREOFFICE_CONVERSION_TIMEOUT", "60"))
+LIBREOFFICE_HEALTHCHECK_INTERVAL = int(os.getenv("LIBREOFFICE_HEALTHCHECK_INTERVAL", "30"))
+LIBREOFFICE_BINARY = os.getenv("LIBREOFFICE_BINARY", "")
+LIBREOFFICE_PYTHON = os.getenv("LIBREOFFICE_PYTHON", "")
+
+# DOCX-шаблоны, PDF по которым формируется без LibreOffice (api_v1/users/pdf_render.py).
+# Если шаблон окажется неподдерживаемым, используется LibreOffice.
+NATIVE_PDF_TEMPLATES = [
+    name.strip()
+    for name in os.getenv(
+        "NATIVE_PDF_TEMPLATES",
+        "Текст для согласия рус.docx,Текст для согласия англ.docx,Текст для согласия франц.docx",
+    ).split(",")
+    if name.strip()
+]
+
+# Сколько часов хранятся документы, сформированные в фоне
+DOCUMENT_JOB_TTL_HOURS = int(os.getenv("DOCUMENT_JOB_TTL_HOURS", "24"))
+# Выгрузка документов нескольких кандидатов: не больше стольких кандидатов
+# за раз, документы формируют параллельные задачи celery по DOCUMENT_EXPORT_CHUNK_SIZE
+DOCUMENT_EXPORT_MAX_CANDIDATES = int(os.getenv("DOCUMENT_EXPORT_MAX_CANDIDATES", "500"))
+DOCUMENT_EXPORT_CHUNK_SIZE = int(os.getenv("DOCUMENT_EXPORT_CHUNK_SIZE", "10"))
+
+# Кэш сформированных документов кандидатов (общий для веб-процессов и celery).
+# Содержит персональные данные, поэтому лежит вне MEDIA_ROOT
+CACHE_ROOT = os.getenv("CACHE_ROOT", os.path.join(BASE_DIR, "cache"))
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR", os.path.join(CACHE_ROOT, "documents"))
+DOCUMENT_CACHE_MAX_SIZE_MB = int(os.getenv("DOCUMENT_CACHE_MAX_SIZE_MB", "512"))
+# Уменьшенные копии фото и подписей для документов (вне MEDIA_ROOT)
+DOCUMENT_IMAGE_CACHE_DIR = os.getenv("DOCUMENT_IMAGE_CACHE_DIR", os.path.join(CACHE_ROOT, "images"))
+DOCUMENT_IMAGE_MAX_WIDTH = int(os.getenv("DOCUMENT_IMAGE_MAX_WIDTH", "300"))
+# Через сколько дней без обращений копия удаляется
+DOCUMENT_IMAGE_CACHE_TTL_DAYS = int(os.getenv("DOCUMENT_IMAGE_CACHE_TTL_DAYS", "30"))
+# Размер XLSX, до которого файл формируется в памяти, а не во временном файле
+XLSX_SPOOL_MAX_SIZE_MB = int(os.getenv("XLSX_SPOOL_MAX_SIZE_MB", "5"))
+
+# Как часто (в секундах) процесс сверяет свою копию глобальных настроек с версией в кэше
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", "5"))
+
+# Сколько секунд хранится дерево подразделений организации (сбрасывается при изменениях)
+DEPARTMENT_TREE_CACHE_TTL = int(os.getenv("DEPARTMENT_TREE_CACHE_TTL", "86400"))
+
+# SMTP-соединения организаций в пуле процесса: через сколько секунд простоя
+# соединение закрывается и через сколько проверяется командой NOOP перед отправкой
+SMTP_POOL_IDLE_TIMEOUT = int(os.getenv("SMTP_POOL_IDLE_TIMEOUT", "60"))
+SMTP_POOL_HEALTHCHECK_INTERVAL = int(os.getenv("SMTP_POOL_HEALTHCHECK_INTERVAL", "15"))
+
+# Лимиты исходящей почты организаций (users/rate_limit.py), задаются в организации
+EMAIL_RATE_LIMIT_REDIS_URL = os.getenv("EMAIL_RATE_LIMIT_REDIS_URL", "redis://localhost:6379/2")
+# Сколько писем можно отправить подряд, не дожидаясь пополнения лимита
+EMAIL_RATE_LIMIT_BURST = int(os.getenv("EMAIL_RATE_LIMIT_BURST", "5"))
+# Дольше этого (в секундах) задача не ждёт лимит, а переносится на потом
+EMAIL_RATE_LIMIT_MAX_SLEEP = int(os.getenv("EMAIL_RATE_LIMIT_MAX_SLEEP", "5"))
+# Через сколько секунд повторить отправку, если заняты все соединения организации
+EMAIL_CONNECTION_RETRY_DELAY = int(os.getenv("EMAIL_CONNECTION_RETRY_DELAY", "30"))
+
+# Сколько секунд расшифрованный пароль почты организации хранится в памяти процесса (0 - не хранить)
+EMAIL_PASSWORD_CACHE_TTL = int(os.getenv("EMAIL_PASSWORD_CACHE_TTL", "300"))
+
+# Постраничный вывод списков (api_v1/pagination.py)
+PAGINATION_PAGE_SIZE = int(os.getenv("PAGINATION_PAGE_SIZE", "50"))
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv("PAGINATION_MAX_PAGE_SIZE", "200"))
+# Сколько секунд хранится общее число записей для count=true
+PAGINATION_COUNT_CACHE_TTL = int(os.getenv("PAGINATION_COUNT_CACHE_TTL", "60"))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
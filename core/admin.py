@@ -2,9 +2,12 @@ from django import forms
 from django.template.response import TemplateResponse
 from django.contrib.admin.helpers import AdminForm
 from django.contrib import messages
+from django.http import HttpResponseRedirect
 
 from unfold.admin import ModelAdmin
 
+from core.models import VersionConflict
+
 
 class VersionedAdmin(ModelAdmin):
     
@@ -19,4 +22,16 @@ class VersionedAdmin(ModelAdmin):
             form.base_fields["version"].widget = forms.HiddenInput()
 
         return form
-    
\ No newline at end of file
+
+    def save_model(self, request, obj, form, change):
+        if change and form.cleaned_data.get("version") is not None:
+            # версия из формы проверяется в том же UPDATE, что и запись изменений
+            obj.expected_version = form.cleaned_data["version"]
+        super().save_model(request, obj, form, change)
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except VersionConflict as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
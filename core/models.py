@@ -1,5 +1,12 @@
 from django.db import models
-from django.core.exceptions import ValidationError
+from django.db.models.fields.files import FieldFile
+
+
+class VersionConflict(Exception):
+    """Версия записи в базе не совпала с ожидаемой: запись изменил кто-то другой."""
+
+    def __init__(self, message="Объект был изменён другим пользователем. Обновите страницу."):
+        super().__init__(message)
 
 
 class VersionedModel(models.Model):
@@ -16,17 +23,95 @@ class VersionedModel(models.Model):
         auto_now=True,
     )
 
+    # Если задана, следующее сохранение выполняется как compare-and-swap:
+    # UPDATE ... WHERE pk = ... AND version = expected_version.
+    # При несовпадении версии выбрасывается VersionConflict.
+    expected_version = None
+
     class Meta:
         abstract = True
-        
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.get_field_values()
+        return instance
+
+    def get_field_values(self) -> dict:
+        """Значения загруженных (не отложенных) полей, файлы - по имени."""
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                values[field.attname] = value.name if isinstance(value, FieldFile) else value
+        return values
+
+    def get_changed_fields(self) -> list[str] | None:
+        """
+        Поля, изменённые с момента загрузки или последнего сохранения.
+        None, если объект не загружался из базы.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return None
+        fields = {field.attname: field.name for field in self._meta.concrete_fields}
+        return [
+            fields[attname]
+            for attname, value in self.get_field_values().items()
+            if attname not in loaded or loaded[attname] != value
+        ]
+
     def save(self, *args, **kwargs):
+        expected_version = self.expected_version
+        self.expected_version = None
+        update_fields = kwargs.get("update_fields")
         if self.pk:
-            self.version = (self.version or 0) + 1
-        super().save(*args, **kwargs)
-        
-    def clean(self):
-        super().clean()
-        if self.pk:
-            db_obj = self.__class__.objects.filter(pk=self.pk).first()
-            if db_obj and db_obj.version != self.version:
-                raise ValidationError("Объект был изменён другим пользователем. Обновите страницу.")
+            if update_fields is None and not self._state.adding:
+                # записываются только изменённые поля
+                update_fields = self.get_changed_fields()
+            if update_fields is not None and not update_fields:
+                loaded_version = getattr(self, "_loaded_values", {}).get("version", self.version)
+                if expected_version is not None and expected_version != loaded_version:
+                    raise VersionConflict()
+                return
+            current_version = self.version
+            self.version = (expected_version or self.version or 0) + 1
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version", "updated_at"}
+            self._cas_version = expected_version
+            try:
+                super().save(*args, **kwargs)
+            except VersionConflict:
+                self.version = current_version
+                raise
+            finally:
+                self._cas_version = None
+        else:
+            super().save(*args, **kwargs)
+        self.remember_field_values(kwargs.get("update_fields"))
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        cas_version = getattr(self, "_cas_version", None)
+        if cas_version is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        # одна инструкция: проверка версии и запись, без предварительного чтения
+        updated = super()._do_update(
+            base_qs.filter(version=cas_version), using, pk_val, values, update_fields, forced_update
+        )
+        if not updated:
+            raise VersionConflict()
+        return updated
+
+    def remember_field_values(self, fields=None):
+        values = self.get_field_values()
+        if fields is None or not hasattr(self, "_loaded_values"):
+            self._loaded_values = values
+            return
+        fields = set(fields)
+        for field in self._meta.concrete_fields:
+            if (field.name in fields or field.attname in fields) and field.attname in values:
+                self._loaded_values[field.attname] = values[field.attname]
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.remember_field_values(fields)
@@ -5,3 +5,6 @@ class DepartmentsConfig(AppConfig):
     name = 'departments'
     verbose_name = "Подразделения"
     verbose_name_plural = "Подразделения"
+
+    def ready(self):
+        import departments.signals  # noqa: F401
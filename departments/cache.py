@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_tree_version_key(organization_id) -> str:
+    return f"departments:tree_version:{organization_id}"
+
+
+def get_tree_version(organization_id) -> int:
+    """
+    Версия дерева подразделений организации, увеличивается при любом изменении.
+    Начальное значение берётся от текущего времени, чтобы после вытеснения ключа
+    из кэша версия не совпала с одной из прежних.
+    """
+    key = get_tree_version_key(organization_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_tree_version(organization_id):
+    key = get_tree_version_key(organization_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def get_cached_tree(organization_id, version: int, build) -> list[dict]:
+    """Дерево из кэша по организации и версии, при промахе строится build()."""
+    key = f"departments:tree:{organization_id}:{version}"
+    tree = cache.get(key)
+    if tree is None:
+        tree = build()
+        cache.set(key, tree, settings.DEPARTMENT_TREE_CACHE_TTL)
+    return tree
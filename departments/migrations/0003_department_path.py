@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:10
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_paths(apps, schema_editor):
+    Department = apps.get_model("departments", "Department")
+    departments = list(Department.objects.all())
+    children = defaultdict(list)
+    for department in departments:
+        children[department.parent_id].append(department)
+
+    stack = [(department, "/", 1) for department in children[None]]
+    while stack:
+        department, parent_path, level = stack.pop()
+        department.path = f"{parent_path}{department.pk}/"
+        department.level = level
+        stack.extend((child, department.path, level + 1) for child in children[department.pk])
+
+    Department.objects.bulk_update(departments, ["path", "level"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departments', '0002_department_created_at_department_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='id подразделений от корня до текущего, например /1/5/12/', max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
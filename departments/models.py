@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.forms import ValidationError
 
 from core.models import VersionedModel
@@ -28,6 +30,14 @@ class Department(VersionedModel):
         default=1,
         verbose_name="Уровень вложенности"
     )
+    path = models.CharField(
+        "Путь в дереве",
+        max_length=255,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="id подразделений от корня до текущего, например /1/5/12/",
+    )
 
     class Meta:
         unique_together = ("organization", "parent", "name")
@@ -43,9 +53,63 @@ class Department(VersionedModel):
             if self.parent.organization != self.organization:
                 raise ValidationError("Подразделение должно быть в той же организации")
 
+            if self.is_ancestor_of(self.parent):
+                raise ValidationError("Подразделение нельзя подчинить самому себе или вложенному подразделению")
+
             if self.parent.level >= 8:
                 raise ValidationError("Максимальная глубина подразделений — 8 уровней")
 
             self.level = self.parent.level + 1
         else:
             self.level = 1
+
+    def is_ancestor_of(self, department) -> bool:
+        return bool(self.pk) and f"/{self.pk}/" in department.path
+
+    def get_descendants(self, include_self: bool = False):
+        """Все вложенные подразделения одним запросом по path."""
+        queryset = Department.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "level", "path"}
+
+        with transaction.atomic():
+            # пути перечитываются из базы: загруженные копии могли устареть,
+            # если с тех пор переносили вышестоящие подразделения
+            parent_path, parent_level = "/", 0
+            if self.parent_id:
+                parent_path, parent_level = (
+                    Department.objects.filter(pk=self.parent_id).values_list("path", "level").get()
+                )
+                if self.pk and f"/{self.pk}/" in parent_path:
+                    raise ValidationError("Подразделение нельзя подчинить самому себе или вложенному подразделению")
+            self.level = parent_level + 1
+            old_path = ""
+            stored = Department.objects.filter(pk=self.pk).values_list("path", "level").first() if self.pk else None
+            if stored is not None:
+                old_path = stored[0]
+                # изменённые поля сравниваются с базой, а не с устаревшей копией
+                if hasattr(self, "_loaded_values"):
+                    self._loaded_values.update(path=stored[0], level=stored[1])
+
+            if self.pk:
+                self.path = f"{parent_path}{self.pk}/"
+                super().save(*args, **kwargs)
+            else:
+                # путь содержит собственный id, поэтому пишется после вставки
+                super().save(*args, **kwargs)
+                self.path = f"{parent_path}{self.pk}/"
+                Department.objects.filter(pk=self.pk).update(path=self.path)
+                self.remember_field_values(["path"])
+
+            if old_path and old_path != self.path:
+                # перенос: пути и уровни вложенных подразделений меняются одним запросом
+                Department.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(self.path), Substr("path", len(old_path) + 1)),
+                    level=F("level") + (self.path.count("/") - old_path.count("/")),
+                )
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from departments.cache import bump_tree_version
+from departments.models import Department
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def department_changed(sender, instance, **kwargs):
+    organization_id = instance.organization_id
+    transaction.on_commit(lambda: bump_tree_version(organization_id))
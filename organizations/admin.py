@@ -51,4 +51,5 @@ class OrganizationAdmin(VersionedAdmin):
     fieldsets = (
         ("Основная информация", {"fields": ("name", "domain", "version")}),
         ("Почтовые настройки", {"fields": ("email", "email_host", "email_password", "email_port")}),
+        ("Ограничения отправки", {"fields": ("email_rate_limit", "email_max_connections")}),
     )
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from cryptography.fernet import Fernet
+from django.conf import settings
+
+
+class CredentialProvider:
+    """
+    Шифрование паролей почты организаций.
+    Расшифрованный пароль хранится в памяти процесса не дольше ttl секунд
+    по ключу (id организации, версия), ttl=0 отключает кэш.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._fernet = None
+        self._passwords = {}
+        self._lock = threading.Lock()
+
+    @property
+    def fernet(self) -> Fernet:
+        if self._fernet is None:
+            self._fernet = Fernet(settings.ENCRYPTION_KEY)
+        return self._fernet
+
+    def encrypt(self, raw_password: str) -> bytes:
+        return self.fernet.encrypt(raw_password.encode())
+
+    def get_password(self, organization) -> str:
+        token = bytes(organization.email_password)
+        if organization.pk is None or not self.ttl:
+            return self.fernet.decrypt(token).decode()
+        key = (organization.pk, organization.version)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._passwords.get(key)
+            # пароль, заданный через set_password до сохранения, не совпадёт по токену
+            if cached is not None and cached[0] == token and cached[2] > now:
+                return cached[1]
+        password = self.fernet.decrypt(token).decode()
+        with self._lock:
+            self._passwords = {k: v for k, v in self._passwords.items() if v[2] > now}
+            self._passwords[key] = (token, password, now + self.ttl)
+        return password
+
+    def invalidate(self, organization_id: int):
+        with self._lock:
+            self._passwords = {
+                key: value for key, value in self._passwords.items() if key[0] != organization_id
+            }
+
+
+credential_provider = CredentialProvider(settings.EMAIL_PASSWORD_CACHE_TTL)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0003_organization_created_at_organization_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='email_max_connections',
+            field=models.PositiveSmallIntegerField(default=2, help_text='0 - без ограничения', verbose_name='Одновременных SMTP-соединений'),
+        ),
+        migrations.AddField(
+            model_name='organization',
+            name='email_rate_limit',
+            field=models.PositiveIntegerField(default=60, help_text='0 - без ограничения', verbose_name='Писем в минуту'),
+        ),
+    ]
@@ -1,8 +1,7 @@
-from django.conf import settings
 from django.db import models
-from cryptography.fernet import Fernet
 
 from core.models import VersionedModel
+from organizations.credentials import credential_provider
 
 
 class Organization(VersionedModel):
@@ -32,6 +31,16 @@ class Organization(VersionedModel):
     email_port = models.PositiveIntegerField(
         verbose_name="Порт SMTP-сервера"
     )
+    email_rate_limit = models.PositiveIntegerField(
+        default=60,
+        verbose_name="Писем в минуту",
+        help_text="0 - без ограничения"
+    )
+    email_max_connections = models.PositiveSmallIntegerField(
+        default=2,
+        verbose_name="Одновременных SMTP-соединений",
+        help_text="0 - без ограничения"
+    )
 
     class Meta:
         verbose_name = "организация"
@@ -41,9 +50,9 @@ class Organization(VersionedModel):
         return self.name
     
     def set_password(self, raw_password: str):
-        f = Fernet(settings.ENCRYPTION_KEY)
-        self.email_password = f.encrypt(raw_password.encode())
+        self.email_password = credential_provider.encrypt(raw_password)
+        if self.pk is not None:
+            credential_provider.invalidate(self.pk)
 
     def get_password(self) -> str:
-        f = Fernet(settings.ENCRYPTION_KEY)
-        return f.decrypt(self.email_password).decode()
+        return credential_provider.get_password(self)
@@ -6,3 +6,6 @@ class SettingsConfig(AppConfig):
     name = 'settings'
     verbose_name = "Настройки"
     verbose_name_plural = "Настройки"
+
+    def ready(self):
+        import settings.signals  # noqa: F401
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from settings.models import Settings
+
+# Версия настроек в общем кэше (Redis): увеличивается при сохранении Settings,
+# по ней процессы узнают, что локальная копия устарела
+VERSION_CACHE_KEY = "settings:version"
+
+
+class SettingsCache:
+    """
+    Локальная для процесса копия записи Settings.
+    Не чаще раза в SETTINGS_CACHE_TTL секунд сверяет версию в общем кэше
+    и перечитывает запись из базы, только если версия изменилась.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked_at = None
+
+    def get(self) -> Settings | None:
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < settings.SETTINGS_CACHE_TTL:
+                return self._value
+            version = cache.get(VERSION_CACHE_KEY)
+            if version is None:
+                cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+                version = cache.get(VERSION_CACHE_KEY)
+            if self._checked_at is None or version != self._version:
+                self._value = Settings.objects.first()
+                self._version = version
+            self._checked_at = now
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = None
+        try:
+            cache.incr(VERSION_CACHE_KEY)
+        except ValueError:
+            cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+
+
+settings_cache = SettingsCache()
+
+
+def get_settings() -> Settings | None:
+    """Глобальные настройки системы (только для чтения) или None, если они не заданы."""
+    return settings_cache.get()
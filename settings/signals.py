@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from settings.cache import settings_cache
+from settings.models import Settings
+
+
+@receiver(post_save, sender=Settings)
+@receiver(post_delete, sender=Settings)
+def settings_changed(sender, instance, **kwargs):
+    transaction.on_commit(settings_cache.invalidate)
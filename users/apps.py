@@ -6,3 +6,6 @@ class UsersConfig(AppConfig):
     name = "users"
     verbose_name = "Пользователи"
     verbose_name_plural = "Пользователи"
+
+    def ready(self):
+        import users.signals  # noqa: F401
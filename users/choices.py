@@ -11,8 +11,8 @@ class EducationForm(models.TextChoices):
     FULL_TIME = "full", "Дневная"
     EVENING = "evening", "Вечерняя"
     DISTANCE = "distance", "Заочная"
-    
-    
+
+
 class CandidateStatus(models.TextChoices):
     NEW = "new", "Новый"
     SENT = "sent", "Анкета отправлена"
@@ -20,3 +20,16 @@ class CandidateStatus(models.TextChoices):
     ACCEPTED = "accepted", "Принят"
     ARCHIVED = "archived", "В архиве"
     ANONYMIZED = "anonymized", "Обезличено"
+
+
+class DocumentKind(models.TextChoices):
+    QUESTIONNAIRE_PDF = "questionnaire_pdf", "Анкета (PDF)"
+    QUESTIONNAIRE_XLSX = "questionnaire_xlsx", "Анкета (XLSX)"
+    CONSENT_PDF = "consent_pdf", "Согласие на обработку персональных данных (PDF)"
+
+
+class DocumentJobStatus(models.TextChoices):
+    PENDING = "pending", "В очереди"
+    STARTED = "started", "Формируется"
+    SUCCESS = "success", "Готов"
+    FAILURE = "failure", "Ошибка"
@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# хэши последних файлов: шаблоны, фото и подписи кандидатов
+FILE_HASHES_MAX_SIZE = 1024
+
+_file_hashes = OrderedDict()
+_file_hashes_lock = threading.Lock()
+
+
+def get_file_hash(path: str) -> str:
+    """sha256 файла; пересчитывается только при изменении mtime/размера."""
+    stat = os.stat(path)
+    marker = (stat.st_mtime_ns, stat.st_size)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(path)
+        if cached and cached[0] == marker:
+            _file_hashes.move_to_end(path)
+            return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    file_hash = digest.hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[path] = (marker, file_hash)
+        _file_hashes.move_to_end(path)
+        while len(_file_hashes) > FILE_HASHES_MAX_SIZE:
+            _file_hashes.popitem(last=False)
+    return file_hash
+
+
+class DocumentCache:
+    """
+    Дисковый кэш сформированных документов кандидатов.
+
+    Файл лежит в <root>/<candidate_id>/<ключ>.<ext>, root не должен
+    раздаваться веб-сервером. Ключ - HMAC с SECRET_KEY от
+    id и версии кандидата, версий вакансии и организации (их поля тоже
+    выводятся в документы), хэша шаблона, языка, типа документа и способа
+    формирования (variant), поэтому изменение любой из частей даёт новый ключ,
+    а подобрать имя файла без SECRET_KEY нельзя. Изменения кандидата и
+    вложенных записей сбрасывают каталог кандидата через сигналы
+    users/signals.py. Давно не использованные файлы сверх max_bytes удаляет
+    периодическая задача cleanup_document_cache_task.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def make_key(self, candidate, kind: str, template_path: str, variant: str = "") -> str:
+        vacancy = candidate.vacancy
+        organization = vacancy.department.organization
+        parts = (
+            candidate.pk,
+            candidate.version,
+            vacancy.pk,
+            vacancy.version,
+            organization.pk,
+            organization.version,
+            get_file_hash(template_path),
+            candidate.language,
+            kind,
+            variant,
+        )
+        return hmac.new(
+            settings.SECRET_KEY.encode(), "|".join(map(str, parts)).encode(), hashlib.sha256
+        ).hexdigest()
+
+    def _candidate_dir(self, candidate_id: int) -> str:
+        return os.path.join(self.root, str(candidate_id))
+
+    def _path(self, candidate_id: int, key: str, extension: str) -> str:
+        return os.path.join(self._candidate_dir(candidate_id), f"{key}{extension}")
+
+    def get(self, candidate_id: int, key: str, extension: str) -> str | None:
+        path = self._path(candidate_id, key, extension)
+        try:
+            # mtime служит меткой последнего обращения для вытеснения
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, candidate_id: int, key: str, extension: str, file) -> str:
+        directory = self._candidate_dir(candidate_id)
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(candidate_id, key, extension)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                shutil.copyfileobj(file, tmp)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def invalidate(self, candidate_id: int):
+        shutil.rmtree(self._candidate_dir(candidate_id), ignore_errors=True)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        logger.info("Кэш документов сокращён до %s байт", total)
+
+
+document_cache = DocumentCache(
+    root=settings.DOCUMENT_CACHE_DIR,
+    max_bytes=settings.DOCUMENT_CACHE_MAX_SIZE_MB * 1024 * 1024,
+)
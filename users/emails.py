@@ -0,0 +1,97 @@
+"""
+Письма кандидатам: шаблоны и темы по типу письма и языку.
+
+Шаблон разбирается один раз на процесс и хранится в _compiled_templates
+уже разбитым на текст и переменные, при отправке выполняется только render
+с контекстом.
+"""
+import threading
+
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+
+from users.choices import CommunicationLanguage
+
+QUESTIONNAIRE = "questionnaire"
+ANONYMIZATION = "anonymization"
+RESET_PASSWORD = "reset_password"
+
+EMAIL_TEMPLATES = {
+    QUESTIONNAIRE: {
+        CommunicationLanguage.RU: "email_template_ru.html",
+        CommunicationLanguage.EN: "email_template_en.html",
+        CommunicationLanguage.FR: "email_template_fr.html",
+    },
+    ANONYMIZATION: {
+        CommunicationLanguage.RU: "email_destroy_ru.html",
+        CommunicationLanguage.EN: "email_destroy_en.html",
+        CommunicationLanguage.FR: "email_destroy_fr.html",
+    },
+    RESET_PASSWORD: {
+        CommunicationLanguage.RU: "email_reset_password_ru.html",
+        CommunicationLanguage.EN: "email_reset_password_en.html",
+        CommunicationLanguage.FR: "email_reset_password_fr.html",
+    },
+}
+
+# Шаблон для языка, которого нет в EMAIL_TEMPLATES
+DEFAULT_TEMPLATE_LANGUAGES = {
+    QUESTIONNAIRE: CommunicationLanguage.RU,
+    ANONYMIZATION: CommunicationLanguage.EN,
+    RESET_PASSWORD: CommunicationLanguage.RU,
+}
+
+EMAIL_SUBJECTS = {
+    QUESTIONNAIRE: {
+        CommunicationLanguage.RU: "Анкета кандидата",
+        CommunicationLanguage.EN: "Candidate questionnaire",
+        CommunicationLanguage.FR: "Questionnaire du candidat",
+    },
+    ANONYMIZATION: {
+        CommunicationLanguage.RU: "Уведомление об удалении персональных данных",
+        CommunicationLanguage.EN: "Personal data deletion notification",
+        CommunicationLanguage.FR: "Suppression des données personnelles",
+    },
+    RESET_PASSWORD: {
+        CommunicationLanguage.RU: "Сброс пароля",
+        CommunicationLanguage.EN: "Password reset",
+        CommunicationLanguage.FR: "Réinitialisation du mot de passe",
+    },
+}
+
+
+def get_email_template_name(kind: str, language: str) -> str:
+    templates = EMAIL_TEMPLATES[kind]
+    return templates.get(language, templates[DEFAULT_TEMPLATE_LANGUAGES[kind]])
+
+
+_compiled_templates = {}
+_compiled_templates_lock = threading.Lock()
+
+
+def get_email_template(kind: str, language: str):
+    """Разобранный шаблон письма, загружается при первом обращении в процессе."""
+    key = (kind, language)
+    with _compiled_templates_lock:
+        template = _compiled_templates.get(key)
+        if template is None:
+            template = get_template(get_email_template_name(kind, language))
+            _compiled_templates[key] = template
+        return template
+
+
+def get_email_subject(kind: str, language: str) -> str:
+    subjects = EMAIL_SUBJECTS[kind]
+    return subjects.get(language, subjects[CommunicationLanguage.RU])
+
+
+def build_email(kind: str, language: str, context: dict, from_email: str, to: list[str]) -> EmailMultiAlternatives:
+    html_body = get_email_template(kind, language).render(context)
+    email = EmailMultiAlternatives(
+        subject=get_email_subject(kind, language),
+        body="",
+        from_email=from_email,
+        to=to,
+    )
+    email.attach_alternative(html_body, "text/html")
+    return email
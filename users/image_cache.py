@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from users.document_cache import get_file_hash
+
+logger = logging.getLogger(__name__)
+
+EXIF_ORIENTATION = 0x0112
+
+
+def get_source_dir(path: str) -> str:
+    """Каталог копий одного исходного файла (фото или подписи кандидата)."""
+    source = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(settings.DOCUMENT_IMAGE_CACHE_DIR, "sources", source)
+
+
+def get_document_image(path: str, max_width: int | None = None) -> str:
+    """
+    Путь к уменьшенной копии фото или подписи для вставки в документы.
+
+    Копия создаётся при первом обращении и хранится в DOCUMENT_IMAGE_CACHE_DIR
+    (вне MEDIA_ROOT) в каталоге исходного файла под его sha256, поэтому новая
+    загрузка получает новую копию. Поворот из EXIF применяется к пикселям.
+    Изображения с прозрачностью сохраняются в PNG, остальные в JPEG.
+    Если исходник не шире max_width и не повёрнут, возвращается он сам.
+    """
+    max_width = max_width or settings.DOCUMENT_IMAGE_MAX_WIDTH
+    with PILImage.open(path) as image:
+        rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+        if image.width <= max_width and not rotated:
+            return path
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        extension = ".png" if has_alpha else ".jpg"
+        directory = get_source_dir(path)
+        cached_path = os.path.join(directory, f"{get_file_hash(path)}_{max_width}{extension}")
+        try:
+            # mtime служит меткой последнего обращения для очистки
+            os.utime(cached_path)
+            return cached_path
+        except FileNotFoundError:
+            pass
+
+        image = ImageOps.exif_transpose(image)
+        width = min(max_width, image.width)
+        height = max(1, round(image.height * width / image.width))
+        if has_alpha:
+            resized = image.convert("RGBA").resize((width, height), PILImage.LANCZOS)
+        else:
+            resized = image.convert("RGB").resize((width, height), PILImage.LANCZOS)
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            if has_alpha:
+                resized.save(tmp, format="PNG", optimize=True)
+            else:
+                resized.save(tmp, format="JPEG", quality=85, optimize=True)
+        os.replace(tmp_path, cached_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return cached_path
+
+
+def delete_document_images(path: str):
+    """Удаляет копии исходного файла, например при замене или удалении фото."""
+    shutil.rmtree(get_source_dir(path), ignore_errors=True)
+
+
+def evict_document_images(max_age_days: int):
+    """Удаляет копии, к которым не обращались дольше max_age_days дней."""
+    root = os.path.join(settings.DOCUMENT_IMAGE_CACHE_DIR, "sources")
+    deadline = time.time() - max_age_days * 86400
+    removed = 0
+    for dirpath, _, filenames in os.walk(root, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                if os.stat(path).st_mtime < deadline:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if dirpath != root:
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+    if removed:
+        logger.info("Удалено устаревших копий изображений: %s", removed)
@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from openpyxl import load_workbook
+
+from api_v1.users.utils import (
+    build_candidate_document,
+    get_consent_pdf,
+    get_document_template_path,
+    get_questionnaire_pdf,
+)
+from api_v1.users.xlsx_templates import get_xlsx_template
+from users.choices import CommunicationLanguage, DocumentKind
+from users.models import Candidate
+
+
+def measure(func, iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Замер времени формирования документов кандидатов (без кэша документов). "
+        "Для PDF сравниваются встроенное формирование и LibreOffice."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--candidate", type=int, help="id кандидата, по умолчанию первый")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--kind",
+            choices=DocumentKind.values,
+            default=DocumentKind.QUESTIONNAIRE_XLSX,
+        )
+
+    def report(self, title: str, timings: list[float]):
+        self.stdout.write(
+            f"{title:<40} median {statistics.median(timings):8.1f} ms"
+            f"   min {min(timings):8.1f} ms   max {max(timings):8.1f} ms"
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        kind = options["kind"]
+
+        if kind == DocumentKind.QUESTIONNAIRE_XLSX:
+            for language in CommunicationLanguage.values:
+                path = get_document_template_path(kind, language)
+                self.report(f"{language}: load_workbook", measure(lambda: load_workbook(path), iterations))
+                get_xlsx_template(path)
+                self.report(
+                    f"{language}: копия из реестра шаблонов",
+                    measure(lambda: get_xlsx_template(path).open(), iterations),
+                )
+
+        candidates = Candidate.objects.select_related(
+            "vacancy",
+            "vacancy__department",
+            "vacancy__department__organization",
+        )
+        if options["candidate"]:
+            candidates = candidates.filter(pk=options["candidate"])
+        candidate = candidates.order_by("pk").first()
+        if candidate is None:
+            raise CommandError("Кандидат не найден")
+
+        title = f"{kind}: кандидат {candidate.pk} ({candidate.language})"
+        if kind == DocumentKind.QUESTIONNAIRE_XLSX:
+            def render():
+                build_candidate_document(candidate, kind).close()
+
+            # первый вызов прогревает реестр шаблонов
+            render()
+            self.report(title, measure(render, iterations))
+            return
+
+        render_pdf = get_consent_pdf if kind == DocumentKind.CONSENT_PDF else get_questionnaire_pdf
+        for engine, native in (("встроенный", True), ("LibreOffice", False)):
+            try:
+                # первый вызов прогревает шрифты и пул LibreOffice
+                render_pdf(candidate, native=native)
+            except Exception as e:
+                self.stdout.write(f"{title}, {engine}: недоступно ({e})")
+                continue
+            self.report(
+                f"{title}, {engine}",
+                measure(lambda: render_pdf(candidate, native=native), iterations),
+            )
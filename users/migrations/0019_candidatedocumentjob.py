@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-17 11:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_alter_candidateotherdocument_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateDocumentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('questionnaire_pdf', 'Анкета (PDF)'), ('questionnaire_xlsx', 'Анкета (XLSX)'), ('consent_pdf', 'Согласие на обработку персональных данных (PDF)')], max_length=30, verbose_name='Тип документа')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('started', 'Формируется'), ('success', 'Готов'), ('failure', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Прогресс, %')),
+                ('file', models.FileField(blank=True, null=True, upload_to='candidates/rendered/', verbose_name='Файл')),
+                ('file_name', models.CharField(blank=True, max_length=255, verbose_name='Имя файла')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_jobs', to='users.candidate', verbose_name='Кандидат')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='document_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Создал')),
+            ],
+            options={
+                'verbose_name': 'задание на формирование документа',
+                'verbose_name_plural': 'Задания на формирование документов',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_candidatedocumentjob'),
+        ('vacancies', '0009_alter_vacancy_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['created_at', 'id'], name='candidate_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:02
+
+from django.db import migrations, models
+
+from users.search import build_search_document
+
+
+def fill_search_document(apps, schema_editor):
+    Candidate = apps.get_model("users", "Candidate")
+    candidates = list(Candidate.objects.all())
+    for candidate in candidates:
+        candidate.search_document = build_search_document(candidate)
+    Candidate.objects.bulk_update(candidates, ["search_document"], batch_size=500)
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX candidate_search_document_ft "
+            "ON users_candidate (search_document)"
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute("DROP INDEX candidate_search_document_ft ON users_candidate")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_candidate_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст для поиска'),
+        ),
+        migrations.RunPython(fill_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
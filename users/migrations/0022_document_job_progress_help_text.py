@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0021_candidate_search_document'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidatedocumentjob',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Этап: 0 - в очереди, 10 - формируется, 90 - сохраняется, 100 - готово', verbose_name='Прогресс, %'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-17 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_document_job_progress_help_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidatedocumentjob',
+            name='candidates',
+            field=models.ManyToManyField(blank=True, related_name='export_jobs', to='users.candidate', verbose_name='Кандидаты выгрузки'),
+        ),
+        migrations.AddField(
+            model_name='candidatedocumentjob',
+            name='failed_candidate_ids',
+            field=models.JSONField(blank=True, default=list, verbose_name='Кандидаты, документы которых не сформированы'),
+        ),
+        migrations.AlterField(
+            model_name='candidatedocumentjob',
+            name='candidate',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='document_jobs', to='users.candidate', verbose_name='Кандидат'),
+        ),
+        migrations.AlterField(
+            model_name='candidatedocumentjob',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Документ кандидата: этапы 0 - в очереди, 10 - формируется, 90 - сохраняется, 100 - готово. Выгрузка: доля обработанных кандидатов', verbose_name='Прогресс, %'),
+        ),
+    ]
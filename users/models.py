@@ -7,8 +7,9 @@ from django.utils import timezone
 from django.db import transaction
 
 from core.models import VersionedModel
-from users.choices import CandidateStatus, CommunicationLanguage, EducationForm
+from users.choices import CandidateStatus, CommunicationLanguage, DocumentJobStatus, DocumentKind, EducationForm
 from users.managers import UserManager
+from users.search import SEARCH_DOCUMENT_FIELDS, FullTextSearch, build_search_document
 from users.tasks import send_candidate_anonymization_email_task
 from users.utils import anonymize_name
 from vacancies.models import Vacancy
@@ -204,10 +205,19 @@ class Candidate(VersionedModel):
         null=True, 
         blank=True
     )
+    search_document = models.TextField(
+        "Текст для поиска",
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "карточка кандидата"
         verbose_name_plural = "Карточки кандидатов"
+        indexes = [
+            # курсорная пагинация списка кандидатов
+            models.Index(fields=["created_at", "id"], name="candidate_created_at_id_idx"),
+        ]
         
     def is_link_valid(self):
         return timezone.now() <= self.link_expiration
@@ -218,6 +228,16 @@ class Candidate(VersionedModel):
     def check_password(self, raw_password):
         return check_password(raw_password, self.password)
     
+    def save(self, *args, **kwargs):
+        # пересчитывается и после обезличивания, старые ФИО и телефон не ищутся
+        changed_fields = self.get_changed_fields()
+        if changed_fields is None or set(changed_fields) & set(SEARCH_DOCUMENT_FIELDS):
+            self.search_document = build_search_document(self)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_document"}
+        super().save(*args, **kwargs)
+
     def anonymize(self):
         with transaction.atomic():
             first_name = self.first_name
@@ -261,14 +281,21 @@ class Candidate(VersionedModel):
             self.employments.all().delete()
             self.family_members.all().delete()
             self.citizenships.all().delete()
+            # файлы заданий удаляет обработчик post_delete
+            CandidateDocumentJob.objects.filter(
+                models.Q(candidate=self) | models.Q(candidates=self)
+            ).delete()
             self.password = ""
             self.save()
             send_candidate_anonymization_email_task.delay(self.id, first_name, last_name)
     
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
-    
-    
+
+
+Candidate._meta.get_field("search_document").register_lookup(FullTextSearch)
+
+
 class CandidateOtherDocument(models.Model):
     candidate = models.ForeignKey(
         Candidate,
@@ -497,6 +524,87 @@ class CandidateFamilyMember(models.Model):
         return self.relation
 
 
+class CandidateDocumentJob(models.Model):
+    # документ одного кандидата; для выгрузки архивом заполняется candidates
+    candidate = models.ForeignKey(
+        Candidate,
+        on_delete=models.CASCADE,
+        related_name="document_jobs",
+        verbose_name="Кандидат",
+        null=True,
+        blank=True
+    )
+    candidates = models.ManyToManyField(
+        Candidate,
+        related_name="export_jobs",
+        verbose_name="Кандидаты выгрузки",
+        blank=True
+    )
+    failed_candidate_ids = models.JSONField(
+        "Кандидаты, документы которых не сформированы",
+        default=list,
+        blank=True
+    )
+    kind = models.CharField(
+        "Тип документа",
+        max_length=30,
+        choices=DocumentKind.choices
+    )
+    status = models.CharField(
+        "Статус",
+        max_length=20,
+        choices=DocumentJobStatus.choices,
+        default=DocumentJobStatus.PENDING
+    )
+    # не измеряемый прогресс, а этапы задачи render_candidate_document_task
+    progress = models.PositiveSmallIntegerField(
+        "Прогресс, %",
+        default=0,
+        help_text=(
+            "Документ кандидата: этапы 0 - в очереди, 10 - формируется, "
+            "90 - сохраняется, 100 - готово. Выгрузка: доля обработанных кандидатов"
+        )
+    )
+    file = models.FileField(
+        "Файл",
+        upload_to="candidates/rendered/",
+        blank=True,
+        null=True
+    )
+    file_name = models.CharField(
+        "Имя файла",
+        max_length=255,
+        blank=True
+    )
+    error = models.TextField(
+        "Ошибка",
+        blank=True
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name="Создал",
+        related_name="document_jobs"
+    )
+    created_at = models.DateTimeField(
+        "Дата создания",
+        auto_now_add=True
+    )
+    finished_at = models.DateTimeField(
+        "Дата завершения",
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = "задание на формирование документа"
+        verbose_name_plural = "Задания на формирование документов"
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.get_status_display()})"
+
+
 class CandidateRefreshToken(models.Model):
     candidate = models.ForeignKey(
         Candidate,
@@ -0,0 +1,112 @@
+"""
+Ограничение исходящей почты организации, общее для всех процессов (Redis).
+
+Писем в минуту - token bucket: запас не больше EMAIL_RATE_LIMIT_BURST писем,
+пополняется со скоростью Organization.email_rate_limit. Одновременные
+SMTP-соединения - аренды в sorted set, которые продлеваются при каждой
+отправке и истекают сами, если процесс завершился, не закрыв соединение.
+"""
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+# Возвращает 0, если токен взят, иначе сколько миллисекунд ждать следующего
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now_parts = redis.call("TIME")
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate / 60000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 60000 / rate)
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil(capacity * 60000 / rate) + 1000)
+return wait
+"""
+
+# Возвращает 1, если аренда соединения получена или продлена
+CONNECTION_LEASE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local now_parts = redis.call("TIME")
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now)
+if redis.call("ZSCORE", KEYS[1], ARGV[3]) or redis.call("ZCARD", KEYS[1]) < limit then
+    redis.call("ZADD", KEYS[1], now + ttl, ARGV[3])
+    redis.call("PEXPIRE", KEYS[1], ttl)
+    return 1
+end
+return 0
+"""
+
+
+class EmailRateLimited(Exception):
+    """Лимит организации исчерпан, отправку нужно повторить через countdown секунд."""
+
+    def __init__(self, countdown: float):
+        super().__init__(f"Лимит отправки почты исчерпан, повтор через {countdown:.0f} с")
+        self.countdown = countdown
+
+
+class EmailRateLimiter:
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._take_token = client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._lease_connection = client.register_script(CONNECTION_LEASE_SCRIPT)
+
+    def acquire_message(self, organization) -> float:
+        """Берёт разрешение на одно письмо; 0 или сколько секунд ждать."""
+        rate = organization.email_rate_limit
+        if not rate:
+            return 0
+        capacity = max(1, min(rate, settings.EMAIL_RATE_LIMIT_BURST))
+        wait = self._take_token(keys=[f"email_limit:tokens:{organization.pk}"], args=[rate, capacity])
+        return int(wait) / 1000
+
+    def wait_for_message(self, organization):
+        """
+        Ждёт разрешения на письмо, если ждать не дольше EMAIL_RATE_LIMIT_MAX_SLEEP
+        секунд, иначе выбрасывает EmailRateLimited.
+        """
+        while True:
+            wait = self.acquire_message(organization)
+            if not wait:
+                return
+            if wait > settings.EMAIL_RATE_LIMIT_MAX_SLEEP:
+                raise EmailRateLimited(wait)
+            time.sleep(wait)
+
+    def acquire_connection(self, organization, lease_id: str, ttl: int) -> bool:
+        """Получает или продлевает на ttl секунд аренду SMTP-соединения."""
+        if not organization.email_max_connections:
+            return True
+        return bool(
+            self._lease_connection(
+                keys=[f"email_limit:connections:{organization.pk}"],
+                args=[organization.email_max_connections, ttl * 1000, lease_id],
+            )
+        )
+
+    def release_connection(self, organization_id: int, lease_id: str):
+        self.client.zrem(f"email_limit:connections:{organization_id}", lease_id)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> EmailRateLimiter:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = EmailRateLimiter(redis.Redis.from_url(settings.EMAIL_RATE_LIMIT_REDIS_URL))
+        return _limiter
@@ -0,0 +1,95 @@
+"""
+Поиск кандидатов по ФИО, email и телефону.
+
+Текст для поиска хранится в Candidate.search_document и пересчитывается при
+каждом сохранении. На MariaDB по нему построен FULLTEXT индекс (миграция
+0021), на остальных СУБД поиск идёт через LIKE.
+"""
+import re
+
+from django.db.models import Lookup
+
+# innodb_ft_min_token_size: более короткие слова не попадают в FULLTEXT индекс
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+# стоп-слова InnoDB по умолчанию (INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD):
+# их нет в индексе, поэтому обязательное +слово* не найдёт ни одной строки
+FULLTEXT_STOPWORDS = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for",
+    "from", "how", "i", "in", "is", "it", "la", "of", "on", "or", "that", "the",
+    "this", "to", "was", "what", "when", "where", "who", "will", "with", "und", "www",
+))
+
+PHONE_QUERY_RE = re.compile(r"[\d\s()+\-]+")
+
+# поля кандидата, из которых строится search_document
+SEARCH_DOCUMENT_FIELDS = ("last_name", "first_name", "middle_name", "email", "phone")
+
+
+def get_phone_digits(phone: str) -> str:
+    return re.sub(r"\D", "", phone or "")
+
+
+def build_search_document(candidate) -> str:
+    # телефон дополнительно целиком цифрами, чтобы искать его одним словом
+    parts = [getattr(candidate, name) for name in SEARCH_DOCUMENT_FIELDS]
+    parts.append(get_phone_digits(candidate.phone))
+    return " ".join(part for part in parts if part).lower()
+
+
+def split_search_query(query: str) -> list[str]:
+    query = query.strip()
+    if PHONE_QUERY_RE.fullmatch(query):
+        digits = get_phone_digits(query)
+        return [digits] if digits else []
+    return re.findall(r"\w+", query.lower())
+
+
+def is_fulltext_term(term: str) -> bool:
+    return len(term) >= FULLTEXT_MIN_TOKEN_SIZE and term not in FULLTEXT_STOPWORDS
+
+
+class FullTextSearch(Lookup):
+    """
+    search_document__fulltext="строка запроса": все слова запроса должны
+    встречаться в документе (слово может быть началом слова документа).
+    На MariaDB короткие слова и стоп-слова ищутся через LIKE.
+    """
+
+    lookup_name = "fulltext"
+    prepare_rhs = False
+
+    def like(self, lhs: str, term: str, connection) -> tuple[str, str]:
+        condition = connection.operators["icontains"] % "%s"
+        return f"{lhs} {condition}", f"%{connection.ops.prep_for_like_query(term)}%"
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        terms = split_search_query(self.rhs)
+        indexed = [term for term in terms if is_fulltext_term(term)]
+        conditions, params = [], []
+        if indexed:
+            conditions.append(f"MATCH ({lhs}) AGAINST (%s IN BOOLEAN MODE)")
+            params.extend(lhs_params)
+            params.append(" ".join(f"+{term}*" for term in indexed))
+        for term in terms:
+            if not is_fulltext_term(term):
+                condition, param = self.like(lhs, term, connection)
+                conditions.append(condition)
+                params.extend(lhs_params)
+                params.append(param)
+        if not conditions:
+            return "1 = 1", []
+        return " AND ".join(conditions), params
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        conditions, params = [], []
+        for term in split_search_query(self.rhs):
+            condition, param = self.like(lhs, term, connection)
+            conditions.append(condition)
+            params.extend(lhs_params)
+            params.append(param)
+        if not conditions:
+            return "1 = 1", []
+        return " AND ".join(conditions), params
@@ -0,0 +1,95 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from users.document_cache import document_cache
+from users.image_cache import delete_document_images
+from users.models import (
+    Candidate,
+    CandidateCitizenship,
+    CandidateDocumentJob,
+    CandidateEducation,
+    CandidateEmployment,
+    CandidateFamilyMember,
+    CandidateRecommendation,
+)
+
+# Вложенные записи, которые выводятся в анкету. Их изменение не меняет
+# версию кандидата, поэтому кэш документов сбрасывается явно.
+CANDIDATE_DOCUMENT_MODELS = (
+    CandidateCitizenship,
+    CandidateEducation,
+    CandidateEmployment,
+    CandidateFamilyMember,
+    CandidateRecommendation,
+)
+
+
+def invalidate_candidate_documents(candidate_id: int):
+    transaction.on_commit(lambda: document_cache.invalidate(candidate_id))
+
+
+@receiver(post_save, sender=Candidate)
+@receiver(post_delete, sender=Candidate)
+def candidate_changed(sender, instance, **kwargs):
+    # Ключ кэша и так содержит версию кандидата, здесь удаляются устаревшие файлы
+    invalidate_candidate_documents(instance.pk)
+
+
+# Изображения кандидата, уменьшенные копии которых хранятся в users/image_cache.py
+CANDIDATE_IMAGE_FIELDS = ("photo", "signature")
+
+
+def delete_candidate_images(names):
+    storage = Candidate._meta.get_field("photo").storage
+    paths = [storage.path(name) for name in names if name]
+    if not paths:
+        return
+
+    def delete_images():
+        for path in paths:
+            delete_document_images(path)
+
+    transaction.on_commit(delete_images)
+
+
+@receiver(pre_save, sender=Candidate)
+def candidate_images_replaced(sender, instance, **kwargs):
+    # копии заменённых или удалённых (в т.ч. при обезличивании) фото и подписи
+    loaded = getattr(instance, "_loaded_values", None)
+    if loaded is None:
+        return
+    current = instance.get_field_values()
+    delete_candidate_images(
+        loaded.get(field)
+        for field in CANDIDATE_IMAGE_FIELDS
+        if field in current and loaded.get(field) != current[field]
+    )
+
+
+@receiver(post_delete, sender=Candidate)
+def candidate_images_deleted(sender, instance, **kwargs):
+    delete_candidate_images(getattr(instance, field).name for field in CANDIDATE_IMAGE_FIELDS)
+
+
+def candidate_document_data_changed(sender, instance, **kwargs):
+    invalidate_candidate_documents(instance.candidate_id)
+
+
+for model in CANDIDATE_DOCUMENT_MODELS:
+    post_save.connect(candidate_document_data_changed, sender=model)
+    post_delete.connect(candidate_document_data_changed, sender=model)
+
+
+@receiver(pre_delete, sender=Candidate)
+def candidate_export_jobs_deleted(sender, instance, **kwargs):
+    # архивы выгрузок с документами кандидата удаляются вместе с ним
+    CandidateDocumentJob.objects.filter(candidates=instance).delete()
+
+
+@receiver(post_delete, sender=CandidateDocumentJob)
+def document_job_deleted(sender, instance, **kwargs):
+    # файл задания содержит персональные данные кандидата
+    if instance.file:
+        file = instance.file
+        transaction.on_commit(lambda: file.delete(save=False))
@@ -0,0 +1,211 @@
+import atexit
+import logging
+import os
+import smtplib
+import threading
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+from users.rate_limit import EmailRateLimited, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых соединение считается разорванным и письмо отправляется повторно
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+def get_organization_email_connection(organization) -> EmailBackend:
+    if organization.email_port == 465:
+        return EmailBackend(
+            host=organization.email_host,
+            port=organization.email_port,
+            username=organization.email,
+            password=organization.get_password(),
+            use_ssl=True,
+            fail_silently=False,
+        )
+    return EmailBackend(
+        host=organization.email_host,
+        port=organization.email_port,
+        username=organization.email,
+        password=organization.get_password(),
+        use_tls=True,
+        fail_silently=False,
+    )
+
+
+class PooledConnection:
+    def __init__(self, organization, backend: EmailBackend, marker: tuple):
+        self.organization = organization
+        self.backend = backend
+        self.marker = marker
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+        # аренда места в лимите одновременных соединений организации
+        self.lease_id = uuid.uuid4().hex
+        self.lease_expires = None
+
+    def close(self):
+        try:
+            self.backend.close()
+        except (smtplib.SMTPException, OSError):
+            self.backend.connection = None
+        if self.lease_expires is not None:
+            self.lease_expires = None
+            try:
+                get_rate_limiter().release_connection(self.organization.pk, self.lease_id)
+            except redis.RedisError as e:
+                # аренда истечёт сама через lease_ttl
+                logger.warning("Не удалось освободить SMTP-соединение в лимите: %s", e)
+
+
+class SMTPConnectionPool:
+    """
+    Открытые SMTP-соединения организаций, по одному на организацию в процессе.
+    Соединение переиспользуется между письмами; если оно простаивало дольше
+    healthcheck_interval, перед отправкой проверяется командой NOOP, после
+    idle_timeout простоя закрывается. При разрыве во время отправки
+    соединение открывается заново и письмо отправляется ещё раз.
+    Если у организации заняты все разрешённые соединения, выбрасывается
+    EmailRateLimited.
+    """
+
+    def __init__(self, idle_timeout: int, healthcheck_interval: int):
+        self.idle_timeout = idle_timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.lease_ttl = idle_timeout * 2
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_marker(organization) -> tuple:
+        # при смене сервера, логина или пароля соединение создаётся заново
+        return (
+            organization.email_host,
+            organization.email_port,
+            organization.email,
+            bytes(organization.email_password),
+        )
+
+    def _get_entry(self, organization) -> PooledConnection:
+        marker = self.get_marker(organization)
+        with self._lock:
+            self._close_idle()
+            entry = self._connections.get(organization.pk)
+            if entry is None or entry.marker != marker:
+                if entry is not None:
+                    entry.close()
+                entry = PooledConnection(
+                    organization, get_organization_email_connection(organization), marker
+                )
+                self._connections[organization.pk] = entry
+            else:
+                # лимиты берутся из последней загруженной копии организации
+                entry.organization = organization
+            return entry
+
+    def _close_idle(self):
+        now = time.monotonic()
+        for organization_id, entry in list(self._connections.items()):
+            if now - entry.last_used > self.idle_timeout and entry.lock.acquire(blocking=False):
+                try:
+                    entry.close()
+                    del self._connections[organization_id]
+                finally:
+                    entry.lock.release()
+
+    def _is_alive(self, entry: PooledConnection) -> bool:
+        try:
+            return entry.backend.connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _lease(self, entry: PooledConnection):
+        """Получает или продлевает аренду, если до её окончания меньше половины срока."""
+        now = time.monotonic()
+        if entry.lease_expires is not None and entry.lease_expires - now > self.lease_ttl / 2:
+            return
+        if not get_rate_limiter().acquire_connection(entry.organization, entry.lease_id, self.lease_ttl):
+            entry.close()
+            raise EmailRateLimited(settings.EMAIL_CONNECTION_RETRY_DELAY)
+        entry.lease_expires = now + self.lease_ttl
+
+    def _open(self, entry: PooledConnection):
+        self._lease(entry)
+        try:
+            entry.backend.open()
+        except BaseException:
+            entry.close()
+            raise
+        entry.last_checked = time.monotonic()
+
+    def _ensure_open(self, entry: PooledConnection):
+        now = time.monotonic()
+        if entry.backend.connection is not None and now - entry.last_checked > self.healthcheck_interval:
+            if not self._is_alive(entry):
+                logger.info("SMTP-соединение %s разорвано, переподключение", entry.backend.host)
+                entry.close()
+            entry.last_checked = now
+        if entry.backend.connection is None:
+            self._open(entry)
+        else:
+            self._lease(entry)
+
+    def send(self, organization, messages) -> int:
+        entry = self._get_entry(organization)
+        with entry.lock:
+            self._ensure_open(entry)
+            try:
+                sent = entry.backend.send_messages(messages)
+            except CONNECTION_ERRORS as e:
+                logger.warning("SMTP-соединение %s оборвалось при отправке: %s", entry.backend.host, e)
+                entry.close()
+                self._open(entry)
+                sent = entry.backend.send_messages(messages)
+            entry.last_used = entry.last_checked = time.monotonic()
+            return sent
+
+    def shutdown(self):
+        with self._lock:
+            entries = list(self._connections.values())
+            self._connections.clear()
+        for entry in entries:
+            entry.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_pid = None
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """Пул создаётся на процесс: сокеты родителя после fork не используются."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SMTPConnectionPool(
+                idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT,
+                healthcheck_interval=settings.SMTP_POOL_HEALTHCHECK_INTERVAL,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@atexit.register
+def shutdown_smtp_pool():
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown()
+
+
+def send_organization_email(organization, message) -> int:
+    """
+    Отправляет письмо через SMTP организации, соединение берётся из пула процесса.
+    Если лимит писем в минуту исчерпан надолго, выбрасывает EmailRateLimited.
+    """
+    get_rate_limiter().wait_for_message(organization)
+    return get_smtp_pool().send(organization, [message])
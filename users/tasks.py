@@ -1,14 +1,34 @@
+from datetime import timedelta
+import os
+import tempfile
+import uuid
 from celery import shared_task
+from django.conf import settings
+from django.core.files import File
 from django.utils import timezone
 import logging
 
-from settings.models import Settings
-from users.choices import CandidateStatus
-from users.utils import anonymize_name, send_reset_password_email, send_candidate_anonymization_email, send_candidate_questionnaire, send_reset_password_email_hr
+from settings.cache import get_settings
+from users.choices import CandidateStatus, DocumentJobStatus
+from users.rate_limit import EmailRateLimited
+from users.utils import anonymize_name, send_reset_password_email, send_candidate_anonymization_email, send_candidate_questionnaire, send_candidate_questionnaires, send_reset_password_email_hr
 
 logger = logging.getLogger(__name__)
 
 
+def reschedule_email_task(task, countdown: float, args=None):
+    """
+    Переносит задачу отправки почты на время, когда лимит организации
+    позволит отправить письмо. Попытки autoretry при этом не расходуются.
+    """
+    logger.info("Отправка почты %s отложена на %.0f с из-за лимита организации", task.name, countdown)
+    task.apply_async(
+        args=task.request.args if args is None else args,
+        kwargs=task.request.kwargs,
+        countdown=countdown,
+    )
+
+
 @shared_task(
     bind=True,
     autoretry_for=(Exception,),
@@ -23,7 +43,10 @@ def send_reset_password_email_task(self, candidate_id: int, reset_link: str):
         logger.warning("Candidate %s not found", candidate_id)
         return
 
-    send_reset_password_email(candidate, reset_link)
+    try:
+        send_reset_password_email(candidate, reset_link)
+    except EmailRateLimited as e:
+        reschedule_email_task(self, e.countdown)
 
 
 @shared_task(
@@ -51,7 +74,10 @@ def send_candidate_anonymization_email_task(self, candidate_id: int, first_name:
         logger.warning("Candidate %s not found", candidate_id)
         return
 
-    send_candidate_anonymization_email(candidate, first_name, last_name)
+    try:
+        send_candidate_anonymization_email(candidate, first_name, last_name)
+    except EmailRateLimited as e:
+        reschedule_email_task(self, e.countdown)
     
     
 @shared_task(
@@ -70,11 +96,211 @@ def send_candidate_questionnaire_task(self, candidate_id: int):
     try:
         send_candidate_questionnaire(candidate)
         logger.info(f"Анкета отправлена на адрес {candidate.email}")
+    except EmailRateLimited as e:
+        reschedule_email_task(self, e.countdown)
     except Exception as e:
         logger.error("Ошибка при отправке анкеты: %s", e, exc_info=True)
         raise
     
     
+@shared_task(bind=True, max_retries=3)
+def send_candidate_questionnaires_task(self, candidate_ids: list[int]):
+    """
+    Отправка анкет списку кандидатов. Неотправленные повторяются отдельной
+    попыткой, отложенные из-за лимита организации переносятся новой задачей.
+    """
+    from django.db.models import F
+    from users.models import Candidate
+    candidates = Candidate.objects.select_related(
+        "user",
+        "vacancy__department__organization",
+    ).filter(id__in=candidate_ids)
+    sent, failed, deferred = send_candidate_questionnaires(candidates)
+    if sent:
+        Candidate.objects.filter(id__in=sent).update(
+            status=CandidateStatus.SENT,
+            version=F("version") + 1,
+            updated_at=timezone.now(),
+        )
+    for deferred_ids, countdown in deferred:
+        reschedule_email_task(self, countdown, args=(deferred_ids,))
+    logger.info(
+        "Анкеты отправлены: %s, не отправлены: %s, отложены: %s",
+        len(sent),
+        len(failed),
+        sum(len(ids) for ids, _ in deferred),
+    )
+    if failed:
+        raise self.retry(args=(failed,), countdown=60 * 2 ** self.request.retries)
+
+
+@shared_task(bind=True)
+def render_candidate_document_task(self, job_id: int):
+    """Формирование документа кандидата в фоне."""
+    from api_v1.users.utils import render_candidate_document
+    from users.models import CandidateDocumentJob
+    try:
+        job = CandidateDocumentJob.objects.select_related(
+            "candidate",
+            "candidate__vacancy",
+        ).get(id=job_id)
+    except CandidateDocumentJob.DoesNotExist:
+        logger.warning("Document job %s not found", job_id)
+        return
+
+    # progress - условные этапы, а не доля выполненной работы
+    job.status = DocumentJobStatus.STARTED
+    job.progress = 10
+    job.save(update_fields=["status", "progress"])
+    try:
+        file, file_name, _ = render_candidate_document(job.candidate, job.kind)
+        job.progress = 90
+        job.save(update_fields=["progress"])
+        extension = os.path.splitext(file_name)[1]
+        with file:
+            job.file.save(f"{uuid.uuid4().hex}{extension}", File(file), save=False)
+    except Exception as e:
+        logger.error("Ошибка при формировании документа: %s", e, exc_info=True)
+        job.status = DocumentJobStatus.FAILURE
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return
+
+    job.file_name = file_name
+    job.status = DocumentJobStatus.SUCCESS
+    job.progress = 100
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "file_name", "status", "progress", "finished_at"])
+
+
+@shared_task(bind=True)
+def export_candidate_documents_task(self, job_id: int):
+    """
+    Выгрузка документов нескольких кандидатов одним ZIP-архивом в фоне.
+    Документы формируются в кэш параллельно задачами по DOCUMENT_EXPORT_CHUNK_SIZE
+    кандидатов, после них архив из кэша собирает finish_candidate_documents_export_task,
+    на сборку в progress приходятся последние 10%.
+    """
+    from celery import chord
+    from users.models import CandidateDocumentJob
+    try:
+        job = CandidateDocumentJob.objects.get(id=job_id)
+    except CandidateDocumentJob.DoesNotExist:
+        logger.warning("Document job %s not found", job_id)
+        return
+
+    job.status = DocumentJobStatus.STARTED
+    job.save(update_fields=["status"])
+    candidate_ids = list(job.candidates.order_by("id").values_list("id", flat=True))
+    size = settings.DOCUMENT_EXPORT_CHUNK_SIZE
+    chunks = [candidate_ids[i:i + size] for i in range(0, len(candidate_ids), size)]
+    if not chunks:
+        finish_candidate_documents_export_task.delay([], job.id)
+        return
+    chord(
+        render_candidate_documents_task.s(job.id, chunk, job.kind, len(candidate_ids))
+        for chunk in chunks
+    )(finish_candidate_documents_export_task.s(job.id))
+
+
+@shared_task
+def render_candidate_documents_task(job_id: int, candidate_ids: list[int], kind: str, total: int) -> list[int]:
+    """
+    Формирует в кэш документы части кандидатов выгрузки.
+    Возвращает id кандидатов, документ которых сформировать не удалось.
+    """
+    from django.db.models import F
+    from api_v1.users.utils import get_cached_candidate_document
+    from users.models import Candidate, CandidateDocumentJob
+    candidates = Candidate.objects.select_related(
+        "vacancy",
+        "vacancy__department",
+        "vacancy__department__organization",
+    ).filter(id__in=candidate_ids)
+    failed = []
+    for candidate in candidates:
+        try:
+            get_cached_candidate_document(candidate, kind)
+        except Exception:
+            logger.exception("Не удалось сформировать документ кандидата %s", candidate.pk)
+            failed.append(candidate.pk)
+    CandidateDocumentJob.objects.filter(id=job_id).update(
+        progress=F("progress") + len(candidate_ids) * 90 // total
+    )
+    return failed
+
+
+@shared_task
+def finish_candidate_documents_export_task(failed_chunks: list[list[int]], job_id: int):
+    """Собирает ZIP-архив выгрузки из документов, сформированных в кэш."""
+    from api_v1.users.utils import write_candidate_documents_zip
+    from users.models import CandidateDocumentJob
+    try:
+        job = CandidateDocumentJob.objects.get(id=job_id)
+    except CandidateDocumentJob.DoesNotExist:
+        logger.warning("Document job %s not found", job_id)
+        return
+
+    candidates = job.candidates.select_related(
+        "vacancy",
+        "vacancy__department",
+        "vacancy__department__organization",
+    ).order_by("id")
+    try:
+        with tempfile.TemporaryFile() as archive:
+            failed = write_candidate_documents_zip(
+                archive,
+                candidates.iterator(chunk_size=100),
+                job.kind,
+                failed_ids=[pk for chunk in failed_chunks for pk in chunk],
+            )
+            archive.seek(0)
+            job.file.save(f"{uuid.uuid4().hex}.zip", File(archive), save=False)
+    except Exception as e:
+        logger.error("Ошибка при выгрузке документов: %s", e, exc_info=True)
+        job.status = DocumentJobStatus.FAILURE
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at"])
+        return
+
+    job.file_name = f"{job.kind}_{timezone.localdate():%Y-%m-%d}.zip"
+    job.failed_candidate_ids = failed
+    if failed:
+        job.error = f"Не сформированы документы кандидатов: {', '.join(map(str, failed))}"
+    job.status = DocumentJobStatus.SUCCESS
+    job.progress = 100
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        "file", "file_name", "failed_candidate_ids", "error", "status", "progress", "finished_at"
+    ])
+
+
+@shared_task
+def cleanup_document_jobs_task():
+    """
+    Периодическая задача: удаляет задания на формирование документов
+    старше DOCUMENT_JOB_TTL_HOURS, файлы удаляет обработчик post_delete.
+    """
+    from users.models import CandidateDocumentJob
+    CandidateDocumentJob.objects.filter(
+        created_at__lt=timezone.now() - timedelta(hours=settings.DOCUMENT_JOB_TTL_HOURS)
+    ).delete()
+
+
+@shared_task
+def cleanup_document_cache_task():
+    """
+    Периодическая задача: сокращает кэш документов до DOCUMENT_CACHE_MAX_SIZE_MB,
+    удаляя давно не использованные файлы, и удаляет копии фото и подписей,
+    к которым не обращались DOCUMENT_IMAGE_CACHE_TTL_DAYS дней.
+    """
+    from users.document_cache import document_cache
+    from users.image_cache import evict_document_images
+    document_cache.evict()
+    evict_document_images(settings.DOCUMENT_IMAGE_CACHE_TTL_DAYS)
+    
     
 @shared_task
 def daily_anonymization_task():
@@ -82,7 +308,7 @@ def daily_anonymization_task():
     Периодическая задача: каждый день в 12:00 проверяет, нужно ли обезличивать кандидатов.
     """
     from users.models import Candidate
-    settings_obj = Settings.objects.first()
+    settings_obj = get_settings()
     if not settings_obj or not settings_obj.anonymization_period_days:
         return
 
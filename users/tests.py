@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api_v1.users.serializers import CandidateSerializer
+from departments.models import Department
+from organizations.models import Organization
+from users.models import Candidate, CandidateEducation, User
+from vacancies.models import Vacancy
+
+
+class CandidateTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr = User.objects.create_user(email="hr@example.com", password="password", role="hr")
+        organization = Organization(
+            name="Организация",
+            domain="example.com",
+            email="hr@example.com",
+            email_host="localhost",
+            email_port=587,
+        )
+        organization.set_password("password")
+        organization.save()
+        department = Department.objects.create(organization=organization, name="Отдел")
+        cls.vacancy = Vacancy.objects.create(department=department, title="Разработчик")
+
+    def create_candidate(self, index: int) -> Candidate:
+        user = User.objects.create(email=f"candidate{index}@example.com", role="candidate")
+        return Candidate.objects.create(
+            user=user,
+            vacancy=self.vacancy,
+            first_name="Иван",
+            last_name="Петров",
+            email=user.email,
+            link_expiration=timezone.now() + timedelta(days=1),
+        )
+
+
+class CandidateListCountTests(CandidateTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.hr)
+
+    def test_count(self):
+        self.create_candidate(1)
+        response = self.client.get("/api/v1/candidates/", {"count": "true"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+
+    def test_count_of_empty_queryset(self):
+        # неизвестное подразделение фильтр превращает в .none()
+        self.create_candidate(1)
+        response = self.client.get("/api/v1/candidates/", {"count": "true", "department_tree": 99999})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 0)
+        self.assertEqual(response.data["results"], [])
+
+
+class CandidateNestedUpdateTests(CandidateTestCase):
+    def update_educations(self, rows: int) -> int:
+        """
+        Изменяет первое образование, добавляет rows новых и удаляет последнее.
+        Возвращает число запросов при сохранении.
+        """
+        candidate = self.create_candidate(rows)
+        for i in range(3):
+            CandidateEducation.objects.create(
+                candidate=candidate,
+                institution_name_and_location=f"Университет {i}",
+                graduation_date=date(2010 + i, 6, 1),
+                specialty="Физика",
+            )
+        candidate = Candidate.objects.get(pk=candidate.pk)
+        educations = CandidateSerializer(candidate).data["educations"]
+        educations = [dict(educations[0], specialty="Математика"), educations[1]] + [
+            {
+                "institution_name_and_location": f"Новый университет {i}",
+                "specialty": "Химия",
+                "graduation_date": "2020-06-01",
+            }
+            for i in range(rows)
+        ]
+        for education in educations:
+            education.pop("diploma_document", None)
+        serializer = CandidateSerializer(
+            candidate,
+            data={"version": candidate.version, "educations": educations},
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+
+        self.assertEqual(candidate.educations.count(), 2 + rows)
+        self.assertEqual(candidate.educations.filter(specialty="Математика").count(), 1)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        self.assertEqual(self.update_educations(1), self.update_educations(20))
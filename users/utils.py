@@ -1,167 +1,124 @@
+from collections import defaultdict
 from datetime import timedelta
+import logging
+import smtplib
 from django.conf import settings
 from django.utils import timezone
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
-from django.core.mail.backends.smtp import EmailBackend
-
-from organizations.models import Organization
-from settings.models import Settings
-from users.choices import CandidateStatus, CommunicationLanguage
-
-EMAIL_QUESTIONNAIRE_TEMPLATES = {
-    "ru": "email_template_ru.html",
-    "en": "email_template_en.html",
-    "fr": "email_template_fr.html",
-}
-
-EMAIL_ANONYMIZATION_TEMPLATES = {
-    "en": "email_destroy_en.html",
-    "fr": "email_destroy_fr.html",
-    "ru": "email_destroy_ru.html"
-}
-
-EMAIL_RESET_PASSWORD_TEMPLATES = {
-    "ru": "email_reset_password_ru.html",
-    "en": "email_reset_password_en.html",
-    "fr": "email_reset_password_fr.html",
-}
-
-def get_reset_password_template(language: str) -> str:
-    return EMAIL_RESET_PASSWORD_TEMPLATES.get(
-        language, EMAIL_RESET_PASSWORD_TEMPLATES["ru"]
-    )
-    
-def get_reset_password_template(language: str) -> str:
-    return EMAIL_RESET_PASSWORD_TEMPLATES.get(
-        language, EMAIL_RESET_PASSWORD_TEMPLATES["ru"]
-    )
-
-def get_email_questionnaire_template(language: str) -> str:
-    return EMAIL_QUESTIONNAIRE_TEMPLATES.get(
-        language, EMAIL_QUESTIONNAIRE_TEMPLATES["ru"]
-    )
-
-
-def get_email_anonymization_template(language: str) -> str:
-    return EMAIL_ANONYMIZATION_TEMPLATES.get(
-        language, EMAIL_ANONYMIZATION_TEMPLATES["en"]
-    )
 
+from settings.cache import get_settings
+from users import emails
+from users.choices import CandidateStatus
+from users.emails import build_email
+from users.rate_limit import EmailRateLimited
+from users.smtp import send_organization_email
 
-def get_organization_email_connection(org: Organization):
-    if org.email_port == 465:
-        return EmailBackend(
-            host=org.email_host,
-            port=org.email_port,
-            username=org.email,
-            password=org.get_password(),
-            use_ssl=True,
-            fail_silently=False,
-        )
-    return EmailBackend(
-        host=org.email_host,
-        port=org.email_port,
-        username=org.email,
-        password=org.get_password(),
-        use_tls=True,
-        fail_silently=False,
-    )
+logger = logging.getLogger(__name__)
 
 
-def send_candidate_questionnaire(candidate):
-    organization = candidate.vacancy.department.organization
-    link = build_candidate_link(candidate)
-    template_name = get_email_questionnaire_template(candidate.language)
+def build_candidate_questionnaire_email(candidate, organization) -> EmailMultiAlternatives:
     context = {
         "name": f"{candidate.last_name} {candidate.first_name}",
         "organization_name": organization,
-        "url": link,
+        "url": build_candidate_link(candidate),
     }
-    html_body = render_to_string(template_name, context)
-    if candidate.language == CommunicationLanguage.FR:
-        subject = "Questionnaire du candidat"
-    elif candidate.language == CommunicationLanguage.EN:
-        subject = "Candidate questionnaire"
-    else:
-        subject = "Анкета кандидата"
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body="",
+    return build_email(
+        emails.QUESTIONNAIRE,
+        candidate.language,
+        context,
         from_email=organization.email,
         to=[candidate.user.email],
-        connection=get_organization_email_connection(organization),
     )
 
-    email.attach_alternative(html_body, "text/html")
-    email.send()
+
+def send_candidate_questionnaire(candidate):
+    organization = candidate.vacancy.department.organization
+    email = build_candidate_questionnaire_email(candidate, organization)
+    send_organization_email(organization, email)
     candidate.status = CandidateStatus.SENT
     candidate.save(update_fields=["status"])
-    
-    
+
+
+def send_candidate_questionnaires(candidates) -> tuple[list[int], list[int], list[tuple[list[int], float]]]:
+    """
+    Отправка анкет нескольким кандидатам. Кандидаты должны быть загружены
+    с user и vacancy__department__organization. Письма организации уходят
+    через одно SMTP-соединение из пула.
+    Статусы не меняются. Возвращает id кандидатов, которым анкета отправлена,
+    id тех, кому отправить не удалось, и отложенные из-за лимита организации:
+    список (id кандидатов, через сколько секунд повторить).
+    """
+    by_organization = defaultdict(list)
+    for candidate in candidates:
+        by_organization[candidate.vacancy.department.organization_id].append(candidate)
+
+    sent, failed, deferred = [], [], []
+    for group in by_organization.values():
+        organization = group[0].vacancy.department.organization
+        for index, candidate in enumerate(group):
+            email = build_candidate_questionnaire_email(candidate, organization)
+            # письма отправляются по одному, чтобы отклонённый адрес
+            # не прерывал отправку остальным кандидатам
+            try:
+                send_organization_email(organization, email)
+            except EmailRateLimited as e:
+                deferred.append(([c.id for c in group[index:]], e.countdown))
+                break
+            except smtplib.SMTPRecipientsRefused as e:
+                logger.error("Ошибка при отправке анкеты кандидату %s: %s", candidate.id, e)
+                failed.append(candidate.id)
+            except Exception as e:
+                # сервер организации недоступен, остальным письма не отправляются
+                logger.error("Ошибка при отправке анкет организации %s: %s", organization.pk, e)
+                failed.extend(c.id for c in group[index:])
+                break
+            else:
+                sent.append(candidate.id)
+    return sent, failed, deferred
+
+
 def send_candidate_anonymization_email(candidate, first_name, last_name):
     organization = candidate.vacancy.department.organization
-    template_name = get_email_anonymization_template(candidate.language)
     context = {
         "organization_name": organization,
         "first_name": first_name,
         "last_name": last_name,
     }
-    html_body = render_to_string(template_name, context)
-    if candidate.language == CommunicationLanguage.FR:
-        subject = "Suppression des données personnelles"
-    elif candidate.language == CommunicationLanguage.EN:
-        subject = "Personal data deletion notification"
-    else:
-        subject = "Уведомление об удалении персональных данных"
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body="",
+    email = build_email(
+        emails.ANONYMIZATION,
+        candidate.language,
+        context,
         from_email=organization.email,
         to=[candidate.user.email],
-        connection=get_organization_email_connection(organization),
     )
-    email.attach_alternative(html_body, "text/html")
-    email.send()
-    
-    
+    send_organization_email(organization, email)
+
+
 def send_reset_password_email(candidate, reset_link: str):
     organization = candidate.vacancy.department.organization
-
-    template_name = get_reset_password_template(candidate.language)
     context = {
         "organization_name": organization,
         "reset_link": reset_link,
     }
-
-    html_body = render_to_string(template_name, context)
-    if candidate.language == CommunicationLanguage.FR:
-        subject = "Réinitialisation du mot de passe"
-    elif candidate.language == CommunicationLanguage.EN:
-        subject = "Password reset"
-    else:
-        subject = "Сброс пароля"
-
-    email = EmailMultiAlternatives(
-        subject=subject,
-        body="",
+    email = build_email(
+        emails.RESET_PASSWORD,
+        candidate.language,
+        context,
         from_email=organization.email,
         to=[candidate.user.email],
-        connection=get_organization_email_connection(organization),
     )
-
-    email.attach_alternative(html_body, "text/html")
-    email.send()
+    send_organization_email(organization, email)
 
 
 def calculate_candidate_link_expiration() -> timezone.datetime | None:
-    settings = Settings.objects.first()
+    settings = get_settings()
     hours = settings.link_expiration_hours if settings else 72
     return timezone.now() + timedelta(hours=hours)
 
 
 def anonymization_candidate_date():
-    settings = Settings.objects.first()
+    settings = get_settings()
     days = settings.anonymization_period_days if settings else 0
     if days:
         return (timezone.now() + timedelta(days=days)).date()